@@ -0,0 +1,299 @@
+import asyncio
+import hmac
+import json
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class RoutePolicy:
+    """
+    Limits for one route prefix: a per-client token bucket (requests_per_minute
+    with `burst` capacity) and a cap on requests running at once, with up to
+    `max_queue` more waiting for a slot
+    """
+
+    __slots__ = ("name", "requests_per_minute", "burst", "max_in_flight", "max_queue")
+
+    def __init__(self, name: str, requests_per_minute: float, burst: float, max_in_flight: int, max_queue: int):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.burst = max(1.0, burst)
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+
+    @classmethod
+    def from_dict(cls, name: str, limits: Dict[str, float]) -> "RoutePolicy":
+        return cls(
+            name,
+            requests_per_minute=float(limits.get("requests_per_minute", 60)),
+            burst=float(limits.get("burst", limits.get("requests_per_minute", 60))),
+            max_in_flight=int(limits.get("max_in_flight", settings.admission_max_in_flight)),
+            max_queue=int(limits.get("max_queue", settings.admission_max_queue)),
+        )
+
+
+class Rejected(Exception):
+    """The request was not admitted; answer 429 with Retry-After"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Gate:
+    """
+    Concurrency cap with a bounded FIFO wait queue. A finishing request hands
+    its slot directly to the oldest waiter, so queued requests are not
+    overtaken by new arrivals.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self.queued = 0
+        self.rejected = 0
+
+    async def enter(self, timeout: float):
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Rejected(f"{self.name} queue is full", settings.admission_busy_retry_after_seconds)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot arrived just as we gave up: pass it on
+                self.leave()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise Rejected(f"{self.name} is busy", settings.admission_busy_retry_after_seconds)
+
+    def leave(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # slot handed over; in_flight unchanged
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "limit": self.limit,
+            "queued_total": self.queued,
+            "rejected": self.rejected,
+        }
+
+
+class AdmissionController:
+    """
+    Decides whether an inbound request may run now, wait, or be rejected.
+
+    A request first spends a token from its client's bucket for the route
+    (clients are identified by a configured API key, else IP). It then needs a
+    slot under the route's in-flight cap and the global one, waiting in a
+    bounded queue for at most `queue_timeout` seconds. Anything over a limit
+    is rejected right away with a Retry-After hint.
+    """
+
+    def __init__(
+        self,
+        route_limits: Dict[str, Dict[str, float]],
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout: float,
+        max_clients: int = 10000,
+        exempt_paths: Optional[List[str]] = None
+    ):
+        self.default = RoutePolicy.from_dict("default", route_limits.get("default", {}))
+        # Longest prefix first, so /fact-check/batch wins over /fact-check
+        self.policies = sorted(
+            (RoutePolicy.from_dict(prefix, limits) for prefix, limits in route_limits.items() if prefix != "default"),
+            key=lambda policy: len(policy.name),
+            reverse=True,
+        )
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self.exempt_paths = set(exempt_paths or [])
+        self.global_gate = _Gate("server", max_in_flight, max_queue)
+        self.route_gates: Dict[str, _Gate] = {
+            policy.name: _Gate(policy.name, policy.max_in_flight, policy.max_queue)
+            for policy in self.policies + [self.default]
+        }
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self.admitted = 0
+        self.rate_limited = 0
+
+    def policy_for(self, path: str) -> Optional[RoutePolicy]:
+        """Policy of the longest matching route prefix; None if the path is exempt"""
+        if path in self.exempt_paths:
+            return None
+        for policy in self.policies:
+            if path == policy.name or path.startswith(policy.name.rstrip("/") + "/"):
+                return policy
+        return self.default
+
+    def _bucket(self, policy: RoutePolicy, client: str) -> TokenBucket:
+        key = (policy.name, client)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(policy.burst, policy.burst * 60.0 / policy.requests_per_minute)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def acquire(self, policy: RoutePolicy, client: str) -> Tuple[_Gate, ...]:
+        """
+        Admit one request or raise Rejected; returns the gates to leave when done
+        """
+        bucket = self._bucket(policy, client)
+        if not bucket.try_acquire():
+            self.rate_limited += 1
+            raise Rejected("rate limit exceeded", bucket.seconds_until_available())
+
+        deadline = time.monotonic() + self.queue_timeout
+        route_gate = self.route_gates[policy.name]
+        await route_gate.enter(self.queue_timeout)
+        try:
+            await self.global_gate.enter(max(0.0, deadline - time.monotonic()))
+        except BaseException:
+            route_gate.leave()
+            raise
+        self.admitted += 1
+        return route_gate, self.global_gate
+
+    @staticmethod
+    def release(gates: Tuple[_Gate, ...]):
+        for gate in gates:
+            gate.leave()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "clients_tracked": len(self._buckets),
+            "server": self.global_gate.stats(),
+            "routes": {name: gate.stats() for name, gate in self.route_gates.items()},
+        }
+
+
+def _known_api_key(key: str) -> bool:
+    return any(hmac.compare_digest(key, known) for known in settings.admission_api_keys)
+
+
+def client_id(scope: Dict[str, Any]) -> str:
+    """
+    Rate-limit identity of a request: its API key header if the key is one of
+    the configured keys, else the client IP. Behind trusted proxies the IP is
+    the last X-Forwarded-For hop they did not add themselves; anything else
+    in the header could have been sent by the client.
+    """
+    headers = dict(scope.get("headers") or [])
+    api_key = headers.get(settings.admission_client_header.lower().encode("latin-1"))
+    if api_key and _known_api_key(api_key.decode("latin-1")):
+        return "key:" + api_key.decode("latin-1")
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    trusted = settings.admission_trusted_proxies
+    if peer in trusted:
+        forwarded = headers.get(b"x-forwarded-for")
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.decode("latin-1").split(",") if hop.strip()]
+            while hops and hops[-1] in trusted:
+                hops.pop()
+            if hops:
+                return "ip:" + hops[-1]
+    return "ip:" + peer
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying the admission controller to HTTP requests. The
+    slot is held until the response body has been sent, so streaming
+    responses count as in flight for their whole duration.
+    """
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.admission_control_enabled:
+            await self.app(scope, receive, send)
+            return
+        policy = self.controller.policy_for(scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = client_id(scope)
+        try:
+            gates = await self.controller.acquire(policy, client)
+        except Rejected as e:
+            who = client if client.startswith("ip:") else "an API key client"
+            logger.warning(f"🚦 Rejected {scope['path']} for {who}: {e.reason}")
+            await self._reject(send, e)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(gates)
+
+    @staticmethod
+    async def _reject(send, rejection: Rejected):
+        retry_after = max(1, math.ceil(rejection.retry_after))
+        body = json.dumps({
+            "error": "Too many requests",
+            "detail": rejection.reason,
+            "retry_after": retry_after,
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(retry_after).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Shared controller used by the middleware in app/main.py (and reported by /health)
+admission_controller = AdmissionController(
+    route_limits=settings.admission_route_limits,
+    max_in_flight=settings.admission_max_in_flight,
+    max_queue=settings.admission_max_queue,
+    queue_timeout=settings.admission_queue_timeout_seconds,
+    max_clients=settings.admission_max_clients,
+    exempt_paths=settings.admission_exempt_paths,
+)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
 import json
 
@@ -22,10 +22,176 @@ class Settings(BaseSettings):
     # CORS
     cors_origins: List[str] = ["https://truth-finder-ai.vercel.app" , "http://localhost:3000"]
 
+    # Inbound admission control: per-client token buckets and in-flight caps with a bounded
+    # wait queue, per route prefix ("default" for the rest). A client is its API key header
+    # if the key is one of admission_api_keys, else its IP; X-Forwarded-For is only honored
+    # for requests arriving from one of admission_trusted_proxies
+    admission_control_enabled: bool = True
+    admission_max_in_flight: int = 64
+    admission_max_queue: int = 128
+    admission_queue_timeout_seconds: float = 10.0
+    admission_busy_retry_after_seconds: float = 2.0
+    admission_client_header: str = "x-api-key"
+    admission_api_keys: List[str] = []
+    admission_trusted_proxies: List[str] = []
+    admission_max_clients: int = 10000
+    admission_exempt_paths: List[str] = ["/", "/health", "/metrics", "/api/v1/health", "/docs", "/redoc", "/openapi.json"]
+    admission_route_limits: Dict[str, Dict[str, float]] = {
+        "/api/v1/fact-check/batch": {"requests_per_minute": 2, "burst": 2, "max_in_flight": 2, "max_queue": 4},
+        "/api/v1/fact-check": {"requests_per_minute": 10, "burst": 5, "max_in_flight": 8, "max_queue": 32},
+        "/api/v1/agent/chat": {"requests_per_minute": 30, "burst": 10, "max_in_flight": 32, "max_queue": 64},
+        "default": {"requests_per_minute": 120, "burst": 30, "max_in_flight": 64, "max_queue": 64},
+    }
+
+    # Prometheus-format /metrics endpoint (component latency, errors, cache hit rates)
+    metrics_enabled: bool = True
+
+    # Opt-in request tracing: send the header with "1" (or "profile" to add a sampled CPU
+    # profile) together with tracing_token in the token header, or trace a random share of
+    # requests. Traces are logged as JSON; requested ones are also kept for GET /traces/{id},
+    # which needs the token too. Sampled traces only go to the logs (no X-Trace-Id, not stored)
+    tracing_enabled: bool = True
+    tracing_header: str = "x-trace"
+    tracing_token_header: str = "x-trace-token"
+    tracing_token: Optional[str] = None
+    tracing_sample_rate: float = 0.0
+    tracing_profiling_enabled: bool = False
+    tracing_profile_interval_seconds: float = 0.005
+    tracing_max_stored: int = 200
+
     # API Settings
     max_tweets_per_request: int = 50
     default_tweets_count: int = 10
 
+    # Native async X API client (used when a bearer token is configured)
+    twitter_api_base_url: str = "https://api.twitter.com"
+    twitter_max_concurrency: int = 20
+    # Single tweet lookups arriving within this window are merged into one bulk request
+    twitter_lookup_batch_window_ms: float = 5.0
+
+    # Twitter recent-search budget (mirrors the X API 15-minute window) and result cache
+    twitter_search_requests_per_window: int = 180
+    twitter_search_window_seconds: int = 900
+    twitter_cache_max_entries: int = 500
+    twitter_cache_fresh_seconds: int = 120
+    twitter_cache_stale_seconds: int = 1800
+
+    # Article extraction
+    article_max_bytes: int = 2_000_000
+    article_max_chars: int = 5000
+    article_fetch_timeout_seconds: float = 15.0
+    # Extracted-article cache: served without a request within its TTL, then revalidated with a conditional GET
+    article_cache_max_bytes: int = 20_000_000
+    article_cache_ttl_seconds: int = 600
+    article_cache_domain_ttls: Dict[str, int] = {}
+
+    # Shared outbound HTTP client
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_timeout_seconds: float = 30.0
+    http_connect_timeout_seconds: float = 5.0
+    http2_enabled: bool = False
+
+    # Per-stage Gemini request timeouts (seconds)
+    gemini_stage_timeouts: Dict[str, float] = {
+        "factcheck": 30.0,
+        "summarizer": 20.0,
+        "news_event": 30.0,
+        "fallback": 25.0,
+        "credibility": 45.0,
+    }
+
+    # Session store
+    session_backend: str = "memory"  # "memory" or "sqlite" (shared by workers on a host)
+    session_sqlite_path: str = "sessions.db"
+    session_max_entries: int = 10000
+    session_ttl_minutes: int = 10
+    chat_history_ttl_minutes: int = 60
+    session_sweep_interval_seconds: int = 60
+
+    # Default per-step timeout for agent pipelines (seconds)
+    pipeline_step_timeout_seconds: float = 30.0
+
+    # Max blocking Gemini SDK calls running at once (worker threads)
+    gemini_max_concurrency: int = 4
+    # Gemini REST resilience: retries with jittered backoff, per-endpoint circuit
+    # breaker, and optional hedged requests once a call passes the observed p95
+    gemini_max_retries: int = 2
+    gemini_retry_base_delay_seconds: float = 0.5
+    gemini_retry_max_delay_seconds: float = 8.0
+    gemini_breaker_failure_threshold: int = 5
+    gemini_breaker_reset_seconds: float = 30.0
+    gemini_hedge_enabled: bool = False
+    gemini_hedge_percentile: float = 95.0
+    gemini_hedge_min_samples: int = 20
+    gemini_hedge_min_delay_seconds: float = 1.0
+    # Gemini routing: API keys ("KEY" or "KEY:REQUESTS_PER_MINUTE"; defaults to gemini_api_key),
+    # model tiers in preference order, and the tier each stage uses
+    gemini_api_keys: List[str] = []
+    gemini_key_requests_per_minute: int = 60
+    gemini_model_tiers: Dict[str, List[str]] = {
+        "lite": ["gemini-2.5-flash-lite", "gemini-2.5-flash"],
+        "standard": ["gemini-2.5-flash"],
+        "strong": ["gemini-2.5-pro", "gemini-2.5-flash"],
+    }
+    gemini_stage_tiers: Dict[str, str] = {
+        "summarizer": "lite",
+        "fallback": "lite",
+        "news_event": "standard",
+        "factcheck": "standard",
+        "credibility": "strong",
+    }
+    # A model counts as degraded once its error rate or latency (EWMA, as a fraction of the
+    # stage timeout) passes these limits; probe_rate of calls still try it so it can recover
+    gemini_router_ewma_alpha: float = 0.2
+    gemini_router_prior_latency_seconds: float = 2.0
+    gemini_router_min_samples: int = 5
+    gemini_router_max_error_rate: float = 0.3
+    gemini_router_max_latency_fraction: float = 0.8
+    gemini_router_probe_rate: float = 0.05
+    # Ask Gemini for schema-constrained JSON (streamed) for credibility analysis
+    gemini_structured_output: bool = True
+
+    # /fact-check latency budget: evidence gathering gets its own slice, the rest goes to the AI analysis
+    fact_check_budget_seconds: float = 20.0
+    fact_check_evidence_budget_seconds: float = 6.0
+    fact_check_max_urls: int = 3
+    fact_check_max_tweets: int = 10
+
+    # Semantic cache of analyzed claims (hashed TF-IDF vectors, needs NumPy).
+    # At or above the reuse threshold a previous verdict is returned as-is if the claims
+    # also agree on numbers, negations, language and links; otherwise, and between the
+    # seed and reuse thresholds, similar verdicts are given to Gemini as context
+    semantic_cache_enabled: bool = True
+    semantic_cache_dim: int = 512
+    semantic_cache_max_entries: int = 20000
+    semantic_cache_ttl_seconds: int = 21600
+    semantic_cache_reuse_threshold: float = 0.9
+    semantic_cache_seed_threshold: float = 0.5
+    semantic_cache_top_k: int = 3
+    semantic_cache_path: Optional[str] = None
+    semantic_cache_autosave_every: int = 50
+
+    # Prompt token budgets (local estimate) per prompt name
+    prompt_default_token_budget: int = 4000
+    prompt_token_budgets: Dict[str, int] = {"credibility": 6000, "news_event": 3000, "factcheck": 2000}
+
+    # Batch fact-check endpoint
+    fact_check_batch_max_items: int = 500
+    fact_check_batch_concurrency: int = 5
+    fact_check_batch_max_concurrency: int = 20
+
+    # LLM response cache (memory LRU + optional SQLite tier shared across workers)
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 1024
+    llm_cache_ttl_seconds: int = 3600
+    llm_cache_sqlite_path: Optional[str] = None
+    # The SQLite tier keeps at most this many rows (least recently used go first);
+    # expired rows and the excess are pruned on this interval
+    llm_cache_sqlite_max_entries: int = 50000
+    llm_cache_prune_interval_seconds: float = 600.0
+
     class Config:
         env_file = ".env"
         case_sensitive = False
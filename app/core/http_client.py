@@ -0,0 +1,74 @@
+import logging
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# App-scoped client shared by every outbound caller. Opened and closed by the
+# FastAPI lifespan in app/main.py; created lazily when running without one
+# (scripts, serverless cold starts).
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_supported() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = settings.http2_enabled
+    if http2 and not _http2_supported():
+        logger.warning("⚠️ HTTP/2 requested but the 'h2' package is not installed. Using HTTP/1.1.")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    timeout = httpx.Timeout(settings.http_timeout_seconds, connect=settings.http_connect_timeout_seconds)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared HTTP client, creating it if the lifespan has not run yet
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """
+    Open the shared HTTP client (called on app startup)
+    """
+    client = get_http_client()
+    logger.info("✅ Shared HTTP client started")
+    return client
+
+
+async def close_http_client():
+    """
+    Close the shared HTTP client and release pooled connections (called on app shutdown)
+    """
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("🔌 Shared HTTP client closed")
+    _client = None
+
+
+def stage_timeout(stage: str) -> httpx.Timeout:
+    """
+    Timeout for a named pipeline stage, falling back to the client default
+    """
+    seconds = settings.gemini_stage_timeouts.get(stage, settings.http_timeout_seconds)
+    return httpx.Timeout(seconds, connect=settings.http_connect_timeout_seconds)
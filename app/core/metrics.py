@@ -0,0 +1,207 @@
+import asyncio
+import contextvars
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.core.tracing import span
+
+# Tracked components that run locally rather than calling out to an API
+LOCAL_COMPONENTS = {"article_parse"}
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels, in Prometheus text format"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] += amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram with labels, in Prometheus text format"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def observe(self, seconds: float, *labels: str):
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self._sums[labels] += seconds
+
+    def count(self, *labels: str) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {self._sums[labels]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+LATENCY = Histogram(
+    "truthfinder_component_latency_seconds",
+    "Latency of calls to Gemini, Twitter and article fetching/parsing",
+    ("component", "operation"),
+)
+ERRORS = Counter(
+    "truthfinder_component_errors_total",
+    "Failed calls to Gemini, Twitter and article fetching/parsing",
+    ("component", "operation", "kind"),
+)
+CACHE = Counter(
+    "truthfinder_cache_requests_total",
+    "Cache lookups by result (hit, stale, revalidated or miss)",
+    ("cache", "result"),
+)
+REGISTRY = (LATENCY, ERRORS, CACHE)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    """
+    Per-request breakdown of where time went, collected by track() and
+    record_cache() while it is the current request's collector
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.cache_hits: Dict[str, int] = defaultdict(int)
+        self.cache_misses: Dict[str, int] = defaultdict(int)
+
+    @property
+    def api_calls(self) -> int:
+        return sum(count for component, count in self.calls.items() if component not in LOCAL_COMPONENTS)
+
+
+_current: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar("request_metrics", default=None)
+
+
+@contextmanager
+def collect_request_metrics() -> Iterator[RequestMetrics]:
+    """
+    Collect the breakdown of everything awaited inside the block (tasks
+    created inside it inherit the collector)
+    """
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+class _Call:
+    __slots__ = ("error",)
+
+    def __init__(self):
+        self.error: Optional[str] = None
+
+    def fail(self, kind: str = "error"):
+        """Mark a call that returned normally as failed (for callers that return None on errors)"""
+        self.error = kind
+
+
+@contextmanager
+def track(component: str, operation: str) -> Iterator[_Call]:
+    """
+    Time one outbound call: feeds the latency histogram and error counter,
+    the current request's breakdown and (if traced) a span. Exceptions
+    count as errors.
+    """
+    call = _Call()
+    started = time.perf_counter()
+    try:
+        with span(f"{component}.{operation}"):
+            yield call
+    except GeneratorExit:
+        # A stream whose consumer stopped reading is not a failed call
+        raise
+    except BaseException as e:
+        if isinstance(e, asyncio.CancelledError):
+            call.fail("cancelled")
+        elif isinstance(e, asyncio.TimeoutError):
+            call.fail("timeout")
+        else:
+            call.fail(getattr(e, "kind", None) or type(e).__name__)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        LATENCY.observe(seconds, component, operation)
+        request = _current.get()
+        if request is not None:
+            request.timings[component] += seconds
+            request.calls[component] += 1
+        if call.error is not None:
+            ERRORS.inc(component, operation, call.error)
+            if request is not None:
+                request.errors[component] += 1
+
+
+def record_cache(cache: str, result: str):
+    """Count a cache lookup; result is "hit", "stale", "revalidated" or "miss" """
+    CACHE.inc(cache, result)
+    request = _current.get()
+    if request is not None:
+        if result == "miss":
+            request.cache_misses[cache] += 1
+        else:
+            request.cache_hits[cache] += 1
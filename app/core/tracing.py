@@ -0,0 +1,288 @@
+import asyncio
+import contextvars
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """
+    One timed operation in a trace. Used as a context manager: entering makes
+    it the parent of spans opened inside it (including in tasks started
+    inside it, which copy the context).
+    """
+
+    __slots__ = ("trace", "name", "attrs", "start", "end", "error", "children", "_token")
+
+    def __init__(self, trace: "Trace", name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.end: Optional[float] = None
+        self.error: Optional[str] = None
+        self.children: List["Span"] = []
+        self._token = None
+
+    def set(self, **attrs: Any):
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None and exc_type is not GeneratorExit:
+            self.error = exc_type.__name__
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited in another context (an async generator resumed elsewhere)
+            pass
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        origin = self.trace.root.start
+        end = self.end if self.end is not None else time.perf_counter()
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.error:
+            data["error"] = self.error
+        if self.end is None:
+            data["unfinished"] = True
+        if self.children:
+            data["children"] = [child.to_dict() for child in self.children]
+        return data
+
+
+class _NoopSpan:
+    """Returned by span() when the request is not being traced"""
+
+    __slots__ = ()
+
+    def set(self, **attrs: Any):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+
+
+def span(name: str, **attrs: Any):
+    """
+    Context manager timing `name` as a child of the current span. When the
+    request is not traced this is a single context variable lookup.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP_SPAN
+    child = Span(parent.trace, name, attrs)
+    parent.children.append(child)
+    return child
+
+
+def is_tracing() -> bool:
+    """True if the current request is being traced"""
+    return _current_span.get() is not None
+
+
+def annotate(**attrs: Any):
+    """Add attributes to the current span, if the request is traced"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attrs)
+
+
+class SamplingProfiler:
+    """
+    Statistical CPU profile: a background thread samples the stack of the
+    thread running the request every `interval` seconds and counts each
+    distinct stack. Concurrent requests share the event loop thread, so
+    their samples are included as well.
+    """
+
+    def __init__(self, thread_id: int, interval: float, max_depth: int = 64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def to_dict(self, top: int = 50) -> Dict[str, Any]:
+        """Most frequent stacks in collapsed (flame graph) form, root first"""
+        return {
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": self.samples,
+            "stacks": [{"stack": stack, "count": count} for stack, count in self.stacks.most_common(top)],
+        }
+
+
+class Trace:
+    def __init__(self, name: str, attrs: Dict[str, Any], profile: bool = False):
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(self, name, attrs)
+        self.profiler: Optional[SamplingProfiler] = None
+        if profile:
+            self.profiler = SamplingProfiler(threading.get_ident(), settings.tracing_profile_interval_seconds)
+
+    async def __aenter__(self) -> "Trace":
+        self.root.__enter__()
+        if self.profiler is not None:
+            self.profiler.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.profiler is not None:
+            # Joining the sampler thread can take up to one interval; don't block the loop on it
+            await asyncio.to_thread(self.profiler.stop)
+        return self.root.__exit__(exc_type, exc, tb)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"trace_id": self.trace_id, "root": self.root.to_dict()}
+        if self.profiler is not None:
+            data["profile"] = self.profiler.to_dict()
+        return data
+
+
+class TraceStore:
+    """Most recent finished traces, for lookup by id"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._traces: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def add(self, trace: Dict[str, Any]):
+        self._traces[trace["trace_id"]] = trace
+        while len(self._traces) > self.max_entries:
+            self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        return self._traces.get(trace_id)
+
+
+trace_store = TraceStore(settings.tracing_max_stored)
+
+
+def has_trace_token(headers) -> bool:
+    """True if the request carries the configured tracing token (never, when none is set)"""
+    if not settings.tracing_token:
+        return False
+    header = settings.tracing_token_header.lower().encode("latin-1")
+    for name, value in headers or ():
+        if name == header:
+            return hmac.compare_digest(value, settings.tracing_token.encode("latin-1"))
+    return False
+
+
+def _trace_mode(scope: Dict[str, Any]) -> Optional[str]:
+    """
+    None, "trace" or "profile" for this request, or "sampled" when it was
+    picked by the sample rate rather than asked for with the token
+    """
+    header = settings.tracing_header.lower().encode("latin-1")
+    headers = scope.get("headers") or ()
+    for name, value in headers:
+        if name == header:
+            if not has_trace_token(headers):
+                break
+            value = value.decode("latin-1").strip().lower()
+            if value == "profile":
+                return "profile" if settings.tracing_profiling_enabled else "trace"
+            if value in ("1", "true", "yes", "on"):
+                return "trace"
+            break
+    if settings.tracing_sample_rate > 0 and random.random() < settings.tracing_sample_rate:
+        return "sampled"
+    return None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that traces a request when asked to by the tracing header
+    ("1", or "profile" to add a CPU profile) sent with the tracing token, or
+    when picked by the sample rate.
+    The trace is logged as JSON. Requested traces are also kept in
+    trace_store and their id returned in the X-Trace-Id response header
+    (fetch it from GET /traces/{id}); sampled ones only go to the logs.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.tracing_enabled:
+            await self.app(scope, receive, send)
+            return
+        mode = _trace_mode(scope)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}", {"path": scope["path"]}, profile=mode == "profile")
+        # Only a caller holding the token may get a retrievable trace
+        requested = mode != "sampled"
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                trace.root.set(status=message["status"])
+                if requested:
+                    headers = list(message.get("headers") or [])
+                    headers.append((b"x-trace-id", trace.trace_id.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            async with trace:
+                await self.app(scope, receive, send_with_trace_id)
+        finally:
+            data = trace.to_dict()
+            if requested:
+                trace_store.add(data)
+            logger.info(f"🔎 Trace {trace.trace_id} {json.dumps(data, default=str)}")
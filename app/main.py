@@ -1,19 +1,49 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+from app.core.admission import AdmissionMiddleware
+from app.core.config import settings
+from app.core.http_client import start_http_client, close_http_client
+from app.core.metrics import render_metrics
+from app.core.tracing import TracingMiddleware, has_trace_token, trace_store
+from app.services.llm_cache import start_llm_cache_pruner, stop_llm_cache_pruner
+from app.services.session_store import start_session_sweeper, stop_session_sweeper
+from app.services.semantic_cache import semantic_cache
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared, pooled HTTP client for all outbound calls
+    await start_http_client()
+    # Periodic expiry of idle chat sessions
+    start_session_sweeper()
+    # Periodic expiry and size cap of the LLM cache's SQLite tier
+    start_llm_cache_pruner()
+    yield
+    await stop_llm_cache_pruner()
+    await stop_session_sweeper()
+    # Persist any claims indexed since the last autosave
+    await semantic_cache.save(force=True)
+    await close_http_client()
+
 # Create FastAPI app
 app = FastAPI(
     title="TruthFinder API",
     description="AI-powered news analysis and fact-checking service",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Admission control (per-client rate limits, in-flight caps); added before CORS so
+# CORS stays outermost and 429 responses still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -21,8 +51,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
+# Opt-in request tracing; outermost, so traces include time spent waiting for admission
+app.add_middleware(TracingMiddleware)
+
 # Health check endpoint
 @app.get("/")
 async def root():
@@ -32,6 +66,23 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "TruthFinder API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces/{trace_id}", include_in_schema=False)
+async def get_trace(trace_id: str, request: Request):
+    """Span tree (and CPU profile, if requested) of a recently traced request"""
+    if not has_trace_token(request.headers.raw):
+        raise HTTPException(status_code=404, detail="Trace not found")
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
 # Import routes
 from app.routes.fact_check import router as fact_check_router
 app.include_router(fact_check_router, prefix="/api/v1", tags=["fact-check"])
@@ -1,11 +1,16 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import List, Optional
 import re
 
 class FactCheckRequest(BaseModel):
     content: str = Field(..., description="News content to fact-check", max_length=5000)
     language: Optional[str] = Field(None, description="Language of the content (optional)")
 
+class BatchFactCheckRequest(BaseModel):
+    claims: List[str] = Field(..., description="Claims or headlines to fact-check", min_items=1)
+    language: Optional[str] = Field(None, description="Language of the content (optional)")
+    concurrency: Optional[int] = Field(None, ge=1, description="Claims analyzed at once (capped server-side)")
+
 class NewsCheckRequest(BaseModel):
     news_text: Optional[str] = Field(
         None, 
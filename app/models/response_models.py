@@ -53,6 +53,22 @@ class AnalysisMetrics(BaseModel):
     tweets_analyzed: int = Field(description="Number of tweets analyzed")
     sources_consulted: int = Field(description="Number of sources consulted")
     api_calls_made: int = Field(description="Number of API calls made")
+    stage_timings: Dict[str, float] = Field(
+        default={},
+        description="Seconds spent in each analysis stage"
+    )
+    degraded_stages: List[str] = Field(
+        default=[],
+        description="Stages cut short by the latency budget or failed"
+    )
+    component_timings: Dict[str, float] = Field(
+        default={},
+        description="Seconds spent in calls to each component (gemini, twitter, article_fetch, article_parse); concurrent calls add up"
+    )
+    component_calls: Dict[str, int] = Field(default={}, description="Calls made to each component")
+    component_errors: Dict[str, int] = Field(default={}, description="Failed calls per component")
+    cache_hits: Dict[str, int] = Field(default={}, description="Cache hits per cache (llm, semantic, twitter_search, article)")
+    cache_misses: Dict[str, int] = Field(default={}, description="Cache misses per cache")
 
 class NewsAnalysisResponse(BaseModel):
     success: bool = Field(description="Whether the analysis was successful")
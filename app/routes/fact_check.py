@@ -1,10 +1,22 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, Response
 from app.services.news_analyzer import NewsAnalyzer
-from app.services.multi_agent_orchestrator import main_agent, multi_agent_orchestrator
-from app.models.request_models import FactCheckRequest
-import logging, re, uuid, os, httpx
+from app.services.multi_agent_orchestrator import main_agent, multi_agent_orchestrator, stream_multi_agent_orchestrator
+from app.services.llm_cache import llm_cache
+from app.services.gemini_client import gemini_client
+from app.services.semantic_cache import semantic_cache
+from app.services.intent_router import detect_intents
+from app.services.tools import twitter
+from app.utils.helpers import article_cache, batch_process
+from app.services.session_store import create_session_store, session_stats
+from app.core.config import settings
+from app.core.admission import admission_controller
+from app.models.request_models import FactCheckRequest, BatchFactCheckRequest
+import logging, re, uuid, os, json, hashlib, httpx
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from typing import Optional
 
 # Setup
 load_dotenv()
@@ -15,9 +27,9 @@ router = APIRouter()
 news_analyzer = NewsAnalyzer()
 
 # Session management
-CHAT_SESSIONS = {}
-SESSION_DATA = {}
-SESSION_TIMEOUT_MINUTES = 10
+SESSION_TIMEOUT_MINUTES = settings.session_ttl_minutes
+CHAT_SESSIONS = create_session_store("chat_history", ttl_seconds=settings.chat_history_ttl_minutes * 60)
+SESSION_DATA = create_session_store("session_data", ttl_seconds=SESSION_TIMEOUT_MINUTES * 60)
 
 # ------------------------- Utility Functions -------------------------
 
@@ -27,21 +39,75 @@ def sanitize_input(text: str) -> str:
     text = re.sub(r'[<>"]', '', text)
     return text[:2000]
 
-def update_session(session_id: str, key: str, value: str):
-    SESSION_DATA.setdefault(session_id, {})
-    SESSION_DATA[session_id][key] = value
-    SESSION_DATA[session_id]['__last_active'] = datetime.utcnow()
-
-def get_session(session_id: str):
-    session = SESSION_DATA.get(session_id)
-    if session:
-        last_active = session.get('__last_active')
-        if last_active and datetime.utcnow() - last_active > timedelta(minutes=SESSION_TIMEOUT_MINUTES):
-            del SESSION_DATA[session_id]
-            return None
-        return session
+async def update_session(session_id: str, key: str, value: str):
+    await SESSION_DATA.update(session_id, {key: value})
+
+async def get_session(session_id: str):
+    # Expiry is handled by the store (idle TTL + background sweeper)
+    return await SESSION_DATA.get(session_id)
+
+async def append_history(session_id: str, role: str, content: str, partial: bool = False) -> list:
+    # One atomic append, so concurrent requests for a session don't drop turns
+    turn = {"role": role, "content": content}
+    if partial:
+        turn["partial"] = True
+    return await CHAT_SESSIONS.append(session_id, turn)
+
+def history_start(cursor, default: int, total: int) -> int:
+    """
+    Resolve a client-supplied history cursor (number of turns already seen)
+    """
+    try:
+        cursor = int(cursor)
+    except (TypeError, ValueError):
+        return default
+    return min(max(cursor, 0), total)
+
+async def memory_reply(session_id: str, message: str) -> Optional[str]:
+    """
+    Handle "remember/recall" messages from session memory; None if the message is not one
+    """
+    lower_msg = message.lower()
+    session = await get_session(session_id) or {}
+
+    if match := re.match(r"my ([\w ]+) is ([\w ]+)", lower_msg):
+        key, value = match.group(1).strip().replace(' ', '_'), match.group(2).strip()
+        await update_session(session_id, key, value)
+        return f"Got it! I'll remember your {key.replace('_', ' ')} is {value}."
+
+    elif lower_msg.startswith("i am "):
+        name = message[5:].strip()
+        await update_session(session_id, "identity", name)
+        return f"Nice to meet you, {name}!"
+
+    elif lower_msg.startswith("my name is"):
+        name = message.split("my name is", 1)[-1].strip().split()[0]
+        await update_session(session_id, "user_name", name)
+        return f"Nice to meet you, {name}!"
+
+    elif "what is my name" in lower_msg or "what's my name" in lower_msg:
+        name = session.get("user_name")
+        return f"Your name is {name}!" if name else "You haven't told me your name yet in this session."
+
+    elif lower_msg.startswith("i live in") or "i am from" in lower_msg:
+        location = message.split()[-1]
+        await update_session(session_id, "location", location)
+        return f"Got it! I'll remember you're from {location}."
+
+    elif "where do i live" in lower_msg or "where am i from" in lower_msg:
+        location = session.get("location")
+        return f"You live in {location}." if location else "You haven't told me where you live yet."
+
+    elif lower_msg.startswith("what is my "):
+        key = lower_msg[11:].strip().replace(' ', '_')
+        value = session.get(key)
+        return f"Your {key.replace('_', ' ')} is {value}." if value else f"You haven't told me your {key.replace('_', ' ')} yet."
+
     return None
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 # ------------------------- Intent & Keyword Sets -------------------------
 
 IDENTITY_RESPONSE = (
@@ -50,13 +116,7 @@ IDENTITY_RESPONSE = (
     "on news articles or claims. I aim to help people spot misinformation and make informed decisions."
 )
 
-IDENT_KEYWORDS = ["who are you", "what's your name", "tell me about yourself", "who is truthfinder", "what is your work"]
-SUMMARY_KEYWORDS = ["summarize", "summary"]
-FACTCHECK_KEYWORDS = ["fact check", "is it true", "verify", "real or fake"]
-BIAS_KEYWORDS = ["bias", "political bias", "tone", "sentiment"]
-INVESTIGATE_KEYWORDS = ["investigate", "investigation", "deep check"]
-REPORT_KEYWORDS = ["report", "generate report", "final report"]
-NEWS_KEYWORDS = ["news", "article", "headline", "report", "fake", "misinformation"]
+# Keyword sets for every intent live in app/services/intent_router.py
 
 # ------------------------- Endpoints -------------------------
 
@@ -74,6 +134,41 @@ async def fact_check_endpoint(request: FactCheckRequest):
         logger.error(f"Error in /fact-check: {e}")
         raise HTTPException(status_code=500, detail="Internal server error.")
 
+@router.post("/fact-check/batch")
+async def fact_check_batch_endpoint(request: BatchFactCheckRequest):
+    """
+    Fact-check many claims in one request. Results are streamed as NDJSON,
+    one line per claim in completion order, tagged with the claim's index.
+    """
+    if len(request.claims) > settings.fact_check_batch_max_items:
+        raise HTTPException(
+            status_code=413, detail=f"At most {settings.fact_check_batch_max_items} claims per batch."
+        )
+    concurrency = min(
+        request.concurrency or settings.fact_check_batch_concurrency, settings.fact_check_batch_max_concurrency
+    )
+
+    async def check_claim(claim: str):
+        content = sanitize_input(claim)
+        if not content or not content.strip():
+            raise ValueError("Claim cannot be empty.")
+        analysis = await news_analyzer.analyze_news_advanced(content, request.language or "english")
+        return jsonable_encoder(analysis)
+
+    async def event_stream():
+        failed = 0
+        async for index, result, error in batch_process(request.claims, check_claim, concurrency):
+            if error is None:
+                line = {"index": index, "status": "ok", "result": result}
+            else:
+                failed += 1
+                logger.error(f"Error in /fact-check/batch item {index}: {error}")
+                line = {"index": index, "status": "error", "error": str(error) or error.__class__.__name__}
+            yield json.dumps(line, default=str) + "\n"
+        yield json.dumps({"done": True, "total": len(request.claims), "failed": failed}) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @router.post("/agent/chat")
 async def chat_agent(request: Request):
     try:
@@ -84,80 +179,124 @@ async def chat_agent(request: Request):
         if not message:
             raise HTTPException(status_code=400, detail="Message cannot be empty.")
 
-        CHAT_SESSIONS.setdefault(session_id, []).append({"role": "user", "content": message})
-        lower_msg = message.lower()
-        session = get_session(session_id) or {}
-        reply_found = False
-
-        # Memory Patterns
-        if match := re.match(r"my ([\w ]+) is ([\w ]+)", lower_msg):
-            key, value = match.group(1).strip().replace(' ', '_'), match.group(2).strip()
-            update_session(session_id, key, value)
-            agent_reply = f"Got it! I'll remember your {key.replace('_', ' ')} is {value}."
-            reply_found = True
-
-        elif lower_msg.startswith("i am "):
-            name = message[5:].strip()
-            update_session(session_id, "identity", name)
-            agent_reply = f"Nice to meet you, {name}!"
-            reply_found = True
-
-        elif lower_msg.startswith("my name is"):
-            name = message.split("my name is", 1)[-1].strip().split()[0]
-            update_session(session_id, "user_name", name)
-            agent_reply = f"Nice to meet you, {name}!"
-            reply_found = True
-
-        elif "what is my name" in lower_msg or "what's my name" in lower_msg:
-            name = session.get("user_name")
-            agent_reply = f"Your name is {name}!" if name else "You haven't told me your name yet in this session."
-            reply_found = True
-
-        elif lower_msg.startswith("i live in") or "i am from" in lower_msg:
-            location = message.split()[-1]
-            update_session(session_id, "location", location)
-            agent_reply = f"Got it! I'll remember you're from {location}."
-            reply_found = True
-
-        elif "where do i live" in lower_msg or "where am i from" in lower_msg:
-            location = session.get("location")
-            agent_reply = f"You live in {location}." if location else "You haven't told me where you live yet."
-            reply_found = True
-
-        elif lower_msg.startswith("what is my "):
-            key = lower_msg[11:].strip().replace(' ', '_')
-            value = session.get(key)
-            agent_reply = f"Your {key.replace('_', ' ')} is {value}." if value else f"You haven't told me your {key.replace('_', ' ')} yet."
-            reply_found = True
+        history = await append_history(session_id, "user", message)
+        # Only return turns the client has not seen: this exchange, or everything after its cursor
+        start = history_start(data.get('cursor'), len(history) - 1, len(history))
+        agent_reply = await memory_reply(session_id, message)
+        reply_found = agent_reply is not None
 
         # Intent Routing to Multi-Agent Orchestrator
         if not reply_found:
             try:
-                if any(k in lower_msg for k in IDENT_KEYWORDS):
+                # Matched once here and handed to the orchestrator
+                intents = detect_intents(message)
+                if intents and intents[0].intent == "profile":
                     agent_reply = IDENTITY_RESPONSE
-                elif any(k in lower_msg for k in SUMMARY_KEYWORDS + FACTCHECK_KEYWORDS + BIAS_KEYWORDS + INVESTIGATE_KEYWORDS + REPORT_KEYWORDS + NEWS_KEYWORDS):
-                    agent_reply = await multi_agent_orchestrator(message)
                 else:
-                    agent_reply = await multi_agent_orchestrator(message)
+                    agent_reply = await multi_agent_orchestrator(message, intents)
             except Exception as e:
                 logger.error(f"Agent orchestration error: {e}")
                 agent_reply = "Sorry, something went wrong while processing your request. Please try again shortly."
 
-        CHAT_SESSIONS[session_id].append({"role": "agent", "content": agent_reply})
-        return {"response": agent_reply, "session_id": session_id, "history": CHAT_SESSIONS[session_id]}
+        history = await append_history(session_id, "agent", agent_reply)
+        return {"response": agent_reply, "session_id": session_id, "history": history[start:], "cursor": len(history)}
 
     except Exception as e:
         logger.error(f"Unexpected error in /agent/chat: {e}")
         raise HTTPException(status_code=500, detail="Internal server error. Please try again.")
 
+@router.post("/agent/chat/stream")
+async def chat_agent_stream(request: Request):
+    """
+    Server-Sent Events variant of /agent/chat: forwards reply tokens as they arrive
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON body.")
+    message = sanitize_input(data.get('message', ''))
+    session_id = data.get('session_id') or str(uuid.uuid4())
+
+    if not message:
+        raise HTTPException(status_code=400, detail="Message cannot be empty.")
+
+    await append_history(session_id, "user", message)
+
+    async def event_stream():
+        parts = []
+        recorded = False
+        try:
+            try:
+                reply = await memory_reply(session_id, message)
+                if reply is not None:
+                    parts.append(reply)
+                    yield sse_event("token", {"text": reply})
+                elif (intents := detect_intents(message)) and intents[0].intent == "profile":
+                    parts.append(IDENTITY_RESPONSE)
+                    yield sse_event("token", {"text": IDENTITY_RESPONSE})
+                else:
+                    async for chunk in stream_multi_agent_orchestrator(message, intents):
+                        parts.append(chunk)
+                        yield sse_event("token", {"text": chunk})
+            except Exception as e:
+                logger.error(f"Agent streaming error: {e}")
+                error_reply = "Sorry, something went wrong while processing your request. Please try again shortly."
+                parts.append(error_reply)
+                yield sse_event("token", {"text": error_reply})
+
+            agent_reply = "".join(parts)
+            recorded = True
+            history = await append_history(session_id, "agent", agent_reply)
+            yield sse_event("done", {"response": agent_reply, "session_id": session_id, "cursor": len(history)})
+        finally:
+            if not recorded:
+                # The client disconnected mid-reply: record what was produced so the
+                # user turn still has its agent turn and history cursors stay consistent
+                logger.info(f"🔌 Chat stream for session {session_id} closed early; saving partial reply")
+                await append_history(session_id, "agent", "".join(parts), partial=True)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "fact-check"}
+    return {"status": "healthy", "service": "fact-check", "llm_cache": llm_cache.stats(), "sessions": await session_stats(), "twitter": twitter.get_stats(), "articles": article_cache.stats(), "semantic_cache": semantic_cache.stats(), "gemini": gemini_client.stats(), "admission": admission_controller.stats()}
 
 @router.get("/sessions/{session_id}")
-async def get_chat_session(session_id: str):
+async def get_chat_session(
+    session_id: str,
+    request: Request,
+    after: int = Query(0, ge=0, description="Return turns after this cursor"),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of turns to return"),
+):
     try:
-        return {"session_id": session_id, "history": CHAT_SESSIONS.get(session_id, [])}
+        history = await CHAT_SESSIONS.get(session_id) or []
+        page = history[after:after + limit]
+        cursor = after + len(page)
+
+        # ETag covers the page contents and the history length, so it changes whenever the page would
+        etag = '"' + hashlib.sha1(
+            json.dumps([session_id, len(history), after, limit, page], default=str).encode("utf-8")
+        ).hexdigest() + '"'
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        body = {
+            "session_id": session_id,
+            "history": page,
+            "cursor": cursor,
+            "total": len(history),
+            "has_more": cursor < len(history),
+        }
+        return Response(
+            content=json.dumps(body, default=str),
+            media_type="application/json",
+            headers={"ETag": etag, "Cache-Control": "no-cache"},
+        )
     except Exception as e:
         logger.error(f"Error getting session: {e}")
         raise HTTPException(status_code=500, detail="Error retrieving session history.")
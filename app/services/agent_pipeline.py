@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineStep:
+    """
+    One agent call in a pipeline.
+
+    `func` receives a dict with the results of the dependencies that
+    succeeded; a failed or timed-out dependency is simply absent, so a step
+    can still produce a partial result from whatever is available.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Awaitable[Any]],
+        depends_on: Iterable[str] = (),
+        timeout: Optional[float] = None,
+    ):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+        self.timeout = timeout
+
+
+class PipelineResult:
+    def __init__(self):
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.results.get(name, default)
+
+
+def _topological_order(steps: List[PipelineStep]) -> List[PipelineStep]:
+    by_name = {step.name: step for step in steps}
+    if len(by_name) != len(steps):
+        raise ValueError("Pipeline step names must be unique")
+    for step in steps:
+        for dep in step.depends_on:
+            if dep not in by_name:
+                raise ValueError(f"Step '{step.name}' depends on unknown step '{dep}'")
+
+    ordered: List[PipelineStep] = []
+    state: Dict[str, int] = {}  # 1 = visiting, 2 = done
+
+    def visit(step: PipelineStep):
+        if state.get(step.name) == 2:
+            return
+        if state.get(step.name) == 1:
+            raise ValueError(f"Pipeline has a dependency cycle at '{step.name}'")
+        state[step.name] = 1
+        for dep in step.depends_on:
+            visit(by_name[dep])
+        state[step.name] = 2
+        ordered.append(step)
+
+    for step in steps:
+        visit(step)
+    return ordered
+
+
+async def run_pipeline(steps: List[PipelineStep], default_timeout: Optional[float] = None) -> PipelineResult:
+    """
+    Run a dependency graph of agent steps, starting each step as soon as its
+    dependencies have finished. Independent steps run concurrently, each under
+    its own timeout, and failures are collected instead of aborting the run.
+    """
+    if default_timeout is None:
+        default_timeout = settings.pipeline_step_timeout_seconds
+
+    result = PipelineResult()
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_step(step: PipelineStep):
+        if step.depends_on:
+            await asyncio.gather(*(tasks[dep] for dep in step.depends_on))
+        inputs = {dep: result.results[dep] for dep in step.depends_on if dep in result.results}
+
+        started = time.perf_counter()
+        try:
+            timeout = step.timeout if step.timeout is not None else default_timeout
+            with span(f"step.{step.name}"):
+                result.results[step.name] = await asyncio.wait_for(step.func(inputs), timeout=timeout)
+        except asyncio.TimeoutError:
+            result.errors[step.name] = f"timed out after {timeout}s"
+            logger.warning(f"⏱️ Pipeline step '{step.name}' timed out after {timeout}s")
+        except Exception as e:
+            result.errors[step.name] = str(e) or e.__class__.__name__
+            logger.error(f"❌ Pipeline step '{step.name}' failed: {e}")
+        finally:
+            result.timings[step.name] = time.perf_counter() - started
+
+    for step in _topological_order(steps):
+        tasks[step.name] = asyncio.create_task(run_step(step))
+
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+    return result
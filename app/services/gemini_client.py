@@ -0,0 +1,434 @@
+import asyncio
+import json
+import logging
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.http_client import get_http_client, stage_timeout
+from app.core.tracing import span
+from app.services.model_router import (
+    ModelRouter, NoApiKeyError, NoCapacityError, NoModelAvailableError, Route, model_router
+)
+from app.utils.resilience import CircuitBreaker, LatencyTracker, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth retrying; any other 4xx is a problem with the request itself
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+SAFETY_FINISH_REASONS = {"SAFETY", "BLOCKLIST", "PROHIBITED_CONTENT", "SPII", "RECITATION", "IMAGE_SAFETY"}
+
+
+class GeminiError(Exception):
+    """
+    A failed Gemini call; `kind` says how callers should treat it
+    """
+
+    kind = "error"
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class GeminiSafetyBlock(GeminiError):
+    """The prompt or the response was blocked by Gemini's safety filters"""
+
+    kind = "safety"
+
+
+class GeminiTransientError(GeminiError):
+    """Rate limit, upstream 5xx, timeout or connection failure: safe to retry"""
+
+    kind = "transient"
+
+
+class GeminiCircuitOpen(GeminiError):
+    """The endpoint's circuit breaker is open; the call was not sent"""
+
+    kind = "unavailable"
+
+
+class GeminiNotConfigured(GeminiError):
+    """No API key is configured; the call was not sent (and is not retried)"""
+
+    kind = "unconfigured"
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers.get("retry-after", ""))
+    except ValueError:
+        return None
+
+
+def error_for_status(response: httpx.Response) -> GeminiError:
+    message = f"Gemini API error {response.status_code}: {response.text[:200]}"
+    if response.status_code in TRANSIENT_STATUSES:
+        return GeminiTransientError(message, response.status_code, _retry_after(response))
+    return GeminiError(message, response.status_code)
+
+
+def check_blocked(data: Dict[str, Any]):
+    """Raise GeminiSafetyBlock if the prompt or the first candidate was blocked"""
+    block_reason = (data.get("promptFeedback") or {}).get("blockReason")
+    if block_reason:
+        raise GeminiSafetyBlock(f"Prompt blocked: {block_reason}")
+    candidates = data.get("candidates") or [{}]
+    finish_reason = candidates[0].get("finishReason")
+    if finish_reason in SAFETY_FINISH_REASONS:
+        raise GeminiSafetyBlock(f"Response blocked: {finish_reason}")
+
+
+def response_texts(data: Dict[str, Any]) -> List[str]:
+    candidates = data.get("candidates") or [{}]
+    return [part.get("text", "") for part in candidates[0].get("content", {}).get("parts", []) if part.get("text")]
+
+
+def extract_text(data: Dict[str, Any]) -> str:
+    """Text of a generateContent response; raises on safety blocks and empty responses"""
+    check_blocked(data)
+    text = "".join(response_texts(data)).strip()
+    if not text:
+        raise GeminiError("Empty response from Gemini AI")
+    return text
+
+
+class GeminiClient:
+    """
+    Resilient caller for the Gemini REST API on the shared HTTP client.
+
+    Every attempt asks the model router for a model and API key for its
+    stage. Failures are classified (safety block, transient, other).
+    Transient ones are retried with jittered exponential backoff (honoring
+    Retry-After), and count towards a per-endpoint (model + method) circuit
+    breaker that fails fast while the upstream is unhealthy. With hedging
+    enabled, a duplicate request is sent once a call has run past the
+    endpoint's observed p95 latency, and the first successful response wins.
+    """
+
+    def __init__(self, router: ModelRouter):
+        self.router = router
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.safety_blocks = 0
+        self.circuit_rejections = 0
+
+    @staticmethod
+    def endpoint(model: str, method: str) -> str:
+        return f"{model}:{method}"
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers[endpoint] = CircuitBreaker(
+                endpoint, settings.gemini_breaker_failure_threshold, settings.gemini_breaker_reset_seconds
+            )
+        return breaker
+
+    def tracker(self, endpoint: str) -> LatencyTracker:
+        tracker = self.latency.get(endpoint)
+        if tracker is None:
+            tracker = self.latency[endpoint] = LatencyTracker()
+        return tracker
+
+    async def generate(self, stage: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send a generateContent request for the stage; returns the response JSON.
+        Raises GeminiSafetyBlock, GeminiCircuitOpen or GeminiError.
+        """
+        return await self._with_retries(lambda: self._hedged(stage, payload))
+
+    async def generate_text(self, stage: str, payload: Dict[str, Any]) -> str:
+        data = await self.generate(stage, payload)
+        try:
+            return extract_text(data)
+        except GeminiSafetyBlock:
+            self.safety_blocks += 1
+            raise
+
+    async def stream_text(self, stage: str, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Stream text chunks via streamGenerateContent (SSE). Transient
+        failures, including finding no key with quota, are retried only until
+        the first chunk has been yielded. With hedging enabled, a duplicate
+        stream is opened if the first chunk has not arrived within the
+        endpoint's observed p95 latency; whichever starts first is kept.
+        """
+        attempt = 0
+        while True:
+            yielded = False
+            try:
+                async with aclosing(self._hedged_stream(stage, payload, attempt)) as stream:
+                    async for text in stream:
+                        yielded = True
+                        yield text
+                return
+            except GeminiTransientError as e:
+                if yielded or attempt >= settings.gemini_max_retries:
+                    raise
+                error = e
+            await self._backoff(getattr(error, "endpoint", "request"), attempt, error)
+            attempt += 1
+
+    async def _hedged_stream(self, stage: str, payload: Dict[str, Any], attempt: int) -> AsyncIterator[str]:
+        delay = self._hedge_delay(stage, "streamGenerateContent")
+        if delay is None:
+            async with aclosing(self._stream(stage, payload, attempt)) as stream:
+                async for text in stream:
+                    yield text
+            return
+
+        # Each stream's first chunk is awaited in a task, so the two can race
+        streams: Dict[asyncio.Future, AsyncIterator[str]] = {}
+
+        def start():
+            stream = self._stream(stage, payload, attempt)
+            streams[asyncio.ensure_future(stream.__anext__())] = stream
+
+        start()
+        primary = next(iter(streams))
+        winner: Optional[AsyncIterator[str]] = None
+        try:
+            done, _ = await asyncio.wait(set(streams), timeout=delay)
+            if not done:
+                self.hedges += 1
+                logger.info(f"🪁 Gemini {stage} stream slower than p{settings.gemini_hedge_percentile:.0f} ({delay:.2f}s); hedging")
+                start()
+            error: Optional[BaseException] = None
+            while winner is None:
+                for task in done:
+                    stream = streams.pop(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        winner, first = stream, task.result()
+                        break
+                    error = task.exception()
+                    if not isinstance(error, GeminiTransientError):
+                        raise error
+                else:
+                    if not streams:
+                        raise error
+                    done, _ = await asyncio.wait(set(streams), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Close every losing stream (and its HTTP response): stop a pending
+            # first read, then close the generator, even if it already yielded
+            for task in streams:
+                task.cancel()
+            await asyncio.gather(*streams, return_exceptions=True)
+            for stream in streams.values():
+                await stream.aclose()
+
+        try:
+            yield first
+            async for text in winner:
+                yield text
+        finally:
+            # The consumer may stop early
+            await winner.aclose()
+
+    async def _stream(self, stage: str, payload: Dict[str, Any], attempt: int) -> AsyncIterator[str]:
+        """One streamGenerateContent attempt; raises GeminiError if nothing was streamed"""
+        route: Optional[Route] = None
+        recorded = False
+        try:
+            route, endpoint, breaker = self._route(stage, "streamGenerateContent")
+            started = time.perf_counter()
+            yielded = False
+            try:
+                with span("http.gemini", endpoint=endpoint, key=route.key_index, attempt=attempt):
+                    async with get_http_client().stream(
+                        "POST", route.url("streamGenerateContent"), json=payload, timeout=stage_timeout(stage)
+                    ) as response:
+                        if response.status_code >= 400:
+                            await response.aread()
+                            raise error_for_status(response)
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = json.loads(line[5:].strip())
+                            check_blocked(data)
+                            for text in response_texts(data):
+                                yielded = True
+                                yield text
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                raise GeminiTransientError(f"{e.__class__.__name__}: {e}")
+            if not yielded:
+                raise GeminiError("Empty response from Gemini AI")
+            self._record(route, endpoint, breaker, time.perf_counter() - started, None)
+            recorded = True
+        except GeminiError as e:
+            if isinstance(e, GeminiSafetyBlock):
+                self.safety_blocks += 1
+            if route is not None:
+                e.endpoint = endpoint
+                self._record(route, endpoint, breaker, time.perf_counter() - started, e)
+                recorded = True
+            raise
+        finally:
+            if route is not None and not recorded:
+                # Cancelled or abandoned by the consumer (or the losing side of a hedge)
+                breaker.release()
+
+    def _route(self, stage: str, method: str) -> Tuple[Route, str, CircuitBreaker]:
+        """
+        Pick the model/key for one attempt and claim a slot on its circuit breaker
+        """
+        self.calls += 1
+        latency_limit = settings.gemini_router_max_latency_fraction * settings.gemini_stage_timeouts.get(
+            stage, settings.http_timeout_seconds
+        )
+        try:
+            route = self.router.choose(
+                stage, latency_limit, lambda model: not self.breaker(self.endpoint(model, method)).is_open()
+            )
+        except NoModelAvailableError as e:
+            self.circuit_rejections += 1
+            raise GeminiCircuitOpen(str(e))
+        except NoCapacityError as e:
+            raise GeminiTransientError(str(e), 429, e.retry_after)
+        except NoApiKeyError as e:
+            raise GeminiNotConfigured(str(e))
+        endpoint = self.endpoint(route.model, method)
+        breaker = self.breaker(endpoint)
+        if not breaker.allow():
+            self.circuit_rejections += 1
+            raise GeminiCircuitOpen(f"Circuit open for {endpoint}; retry in {breaker.seconds_until_retry():.0f}s")
+        return route, endpoint, breaker
+
+    def _record(self, route: Route, endpoint: str, breaker: CircuitBreaker, latency: float,
+                error: Optional[GeminiError]):
+        if error is None:
+            breaker.record_success()
+            self.tracker(endpoint).observe(latency)
+            self.router.record(route, latency, failed=False)
+        elif error.status == 429:
+            # Per-key quota: pause the key, not the model
+            breaker.release()
+            self.router.record(route, None, failed=True, rate_limited=True, retry_after=error.retry_after)
+        elif isinstance(error, GeminiTransientError):
+            breaker.record_failure()
+            self.router.record(route, None, failed=True)
+        else:
+            # The upstream answered; the failure is specific to this request
+            breaker.record_success()
+            self.router.record(route, latency, failed=False)
+
+    async def _backoff(self, endpoint: str, attempt: int, error: GeminiError):
+        delay = backoff_delay(attempt, settings.gemini_retry_base_delay_seconds, settings.gemini_retry_max_delay_seconds)
+        if error.retry_after is not None:
+            delay = min(max(delay, error.retry_after), settings.gemini_retry_max_delay_seconds)
+        self.retries += 1
+        logger.warning(f"🔁 Gemini {endpoint} transient failure ({error}); retry {attempt + 1} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    async def _with_retries(self, attempt_func: Callable[[], Awaitable[Tuple[str, Any]]]) -> Any:
+        attempt = 0
+        while True:
+            try:
+                _, result = await attempt_func()
+                return result
+            except GeminiTransientError as e:
+                if attempt >= settings.gemini_max_retries:
+                    raise
+                await self._backoff(getattr(e, "endpoint", "request"), attempt, e)
+                attempt += 1
+
+    def _hedge_delay(self, stage: str, method: str = "generateContent") -> Optional[float]:
+        if not settings.gemini_hedge_enabled:
+            return None
+        model = self.router.models_for(stage)[0]
+        tracker = self.tracker(self.endpoint(model, method))
+        if len(tracker) < settings.gemini_hedge_min_samples:
+            return None
+        return max(settings.gemini_hedge_min_delay_seconds, tracker.percentile(settings.gemini_hedge_percentile))
+
+    async def _hedged(self, stage: str, payload: Dict[str, Any]) -> Tuple[str, Any]:
+        delay = self._hedge_delay(stage)
+        if delay is None:
+            return await self._post(stage, payload)
+
+        primary = asyncio.ensure_future(self._post(stage, payload))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.hedges += 1
+                logger.info(f"🪁 Gemini {stage} slower than p{settings.gemini_hedge_percentile:.0f} ({delay:.2f}s); hedging")
+                # The duplicate is routed independently, so it may use another key
+                pending.add(asyncio.ensure_future(self._post(stage, payload)))
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                    if not isinstance(error, GeminiTransientError):
+                        raise error
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _post(self, stage: str, payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        route, endpoint, breaker = self._route(stage, "generateContent")
+        started = time.perf_counter()
+        recorded = False
+        try:
+            try:
+                with span("http.gemini", endpoint=endpoint, key=route.key_index):
+                    response = await get_http_client().post(
+                        route.url("generateContent"), json=payload, timeout=stage_timeout(stage)
+                    )
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                raise GeminiTransientError(f"{e.__class__.__name__}: {e}")
+            if response.status_code >= 400:
+                raise error_for_status(response)
+            data = response.json()
+            self._record(route, endpoint, breaker, time.perf_counter() - started, None)
+            recorded = True
+            return endpoint, data
+        except GeminiError as e:
+            e.endpoint = endpoint
+            self._record(route, endpoint, breaker, time.perf_counter() - started, e)
+            recorded = True
+            raise
+        finally:
+            if not recorded:
+                # Cancelled (e.g. the losing side of a hedge): no outcome to record
+                breaker.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "safety_blocks": self.safety_blocks,
+            "circuit_rejections": self.circuit_rejections,
+            "endpoints": {
+                endpoint: {
+                    **breaker.stats(),
+                    "p95_seconds": self.tracker(endpoint).percentile(95),
+                }
+                for endpoint, breaker in self.breakers.items()
+            },
+            "routing": self.router.stats(),
+        }
+
+
+# Shared client used by every Gemini REST caller
+gemini_client = GeminiClient(model_router)
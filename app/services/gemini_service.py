@@ -1,7 +1,17 @@
 import google.generativeai as genai
 from app.core.config import settings
 from app.models.response_models import FactCheckResult, CredibilityLevel
-from typing import List, Dict, Any
+from app.services.llm_cache import llm_cache
+from app.core.metrics import record_cache, track
+from app.core.tracing import span
+from app.services.gemini_client import gemini_client
+from app.services.model_router import model_router
+from app.utils.json_stream import IncrementalJSONObjectParser
+from app.utils.helpers import calculate_engagement_score
+from app.services.prompt_builder import PromptBuilder
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import logging
 import re
 import json
@@ -9,71 +19,237 @@ import os
 
 logger = logging.getLogger(__name__)
 
+# Routing stage of the credibility analysis; the blocking SDK path uses the tier's first model
+GEMINI_STAGE = "credibility"
+GEMINI_MODEL = model_router.models_for(GEMINI_STAGE)[0]
+
+# Verdict fields first, so they can be read before the long free-text fields are generated
+RESPONSE_FIELD_ORDER = [
+    "is_fake", "credibility_level", "confidence_score", "key_findings", "contradictions_found",
+    "supporting_evidence", "reasoning", "analysis_details",
+]
+
+ANALYSIS_PROMPT = """
+You are an expert fact-checker and news analyst. Analyze the following news content for credibility and truthfulness.
+
+NEWS CONTENT TO ANALYZE:
+{news_content}
+
+LINKED ARTICLES:
+{articles}
+
+RELATED SOCIAL MEDIA CONTEXT:
+{twitter_context}
+
+PREVIOUS ANALYSES OF SIMILAR CLAIMS (the claims may differ; verify independently):
+{related_analyses}
+
+Please provide a comprehensive analysis in the following JSON format:
+
+{{
+    "is_fake": boolean,
+    "credibility_level": "highly_credible" | "credible" | "questionable" | "likely_fake" | "fake",
+    "confidence_score": number between 0 and 1,
+    "reasoning": "detailed explanation of your assessment",
+    "analysis_details": "comprehensive analysis including methodology",
+    "key_findings": ["finding1", "finding2", "finding3"],
+    "contradictions_found": ["contradiction1", "contradiction2"],
+    "supporting_evidence": ["evidence1", "evidence2"]
+}}
+
+Analysis criteria:
+1. Factual accuracy and verifiability
+2. Source credibility and reliability
+3. Logical consistency and coherence
+4. Emotional manipulation or bias indicators
+5. Corroboration with social media discussions
+6. Timeline consistency
+7. Expert consensus (if applicable)
+
+Provide specific, actionable reasoning for your assessment. Be thorough but concise.
+"""
+
+_SCHEMA_TYPES = {"string": "STRING", "boolean": "BOOLEAN", "number": "NUMBER", "integer": "INTEGER", "array": "ARRAY"}
+
+
+def fact_check_response_schema() -> Dict[str, Any]:
+    """
+    Gemini responseSchema for the model-generated fields of FactCheckResult
+    (sources_checked is filled in by the service, not the model)
+    """
+    schema = FactCheckResult.model_json_schema()
+    properties = {}
+    for name in RESPONSE_FIELD_ORDER:
+        field = schema["properties"][name]
+        if name == "credibility_level":
+            prop = {"type": "STRING", "enum": [level.value for level in CredibilityLevel]}
+        else:
+            prop = {"type": _SCHEMA_TYPES[field["type"]]}
+            if field["type"] == "array":
+                prop["items"] = {"type": _SCHEMA_TYPES[field["items"]["type"]]}
+        prop["description"] = field.get("description", "")
+        properties[name] = prop
+    return {
+        "type": "OBJECT",
+        "properties": properties,
+        "required": list(RESPONSE_FIELD_ORDER),
+        "propertyOrdering": list(RESPONSE_FIELD_ORDER),
+    }
+
 class GeminiService:
     def __init__(self):
         self.model = None
         self.is_available = False
+        # Dedicated, bounded pool for the blocking SDK call so a slow analysis
+        # never runs on (or starves) the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.gemini_max_concurrency),
+            thread_name_prefix="gemini"
+        )
+        
+        # Same keys as the REST client (GEMINI_API_KEYS, else GEMINI_API_KEY)
+        if not model_router.keys:
+            logger.warning("⚠️ Gemini API key not configured. Gemini service will be disabled.")
+            return
+        self.is_available = True
         
         try:
-            # Check if API key is available
-            if not settings.gemini_api_key:
-                logger.warning("⚠️ Gemini API key not configured. Gemini service will be disabled.")
-                return
-                
-            genai.configure(api_key=settings.gemini_api_key)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
-            self.is_available = True
+            # The blocking SDK fallback uses the first configured key
+            genai.configure(api_key=model_router.keys[0].key)
+            self.model = genai.GenerativeModel(GEMINI_MODEL)
             logger.info("✅ Gemini AI client initialized successfully")
         except Exception as e:
-            logger.error(f"❌ Failed to initialize Gemini client: {e}")
-            self.is_available = False
+            logger.error(f"❌ Failed to initialize Gemini SDK client: {e}")
     
     async def analyze_news_credibility(
         self, 
         news_content: str, 
-        twitter_data: List[Dict[str, Any]]
+        twitter_data: List[Dict[str, Any]],
+        language: Optional[str] = None,
+        articles: Optional[Dict[str, str]] = None,
+        related: Optional[List[Tuple[str, FactCheckResult]]] = None,
+        raise_errors: bool = False
     ) -> FactCheckResult:
         """
-        Analyze news content credibility using Gemini AI
+        Analyze news content credibility using Gemini AI. Failures return an
+        error result (confidence 0), or raise with raise_errors=True.
         """
-        if not self.is_available or not self.model:
+        # The structured path goes through the REST client; only the SDK path needs self.model
+        if not self.is_available or not (settings.gemini_structured_output or self.model):
+            if raise_errors:
+                raise RuntimeError("Gemini AI service not available")
             logger.warning("⚠️ Gemini service not available. Returning fallback result.")
             return self._create_error_result("Gemini AI service not available")
             
         try:
             logger.info("Starting Gemini AI analysis")
             
-            # Prepare Twitter context
-            twitter_context = self._prepare_twitter_context(twitter_data)
+            if settings.gemini_structured_output:
+                result = None
+                async for name, value in self.stream_news_credibility(
+                    news_content, twitter_data, language, articles, related
+                ):
+                    if name == "result":
+                        result = value
+                logger.info(f"Gemini analysis completed. Credibility: {result.credibility_level}")
+                return result
             
-            # Create comprehensive analysis prompt
-            prompt = self._create_analysis_prompt(news_content, twitter_context)
+            prompt = self._create_analysis_prompt(news_content, twitter_data, articles, language, related)
             
-            # Generate analysis
-            response = self.model.generate_content(prompt)
+            # Reuse a cached completion for an identical prompt
+            cache_key = llm_cache.make_key(GEMINI_MODEL, prompt)
+            response_text = await llm_cache.get(cache_key)
+            record_cache("llm", "miss" if response_text is None else "hit")
             
-            if not response.text:
-                raise Exception("Empty response from Gemini AI")
+            fresh = response_text is None
+            if fresh:
+                # Generate analysis
+                with track("gemini", GEMINI_STAGE):
+                    response = await self._generate_content(prompt)
+                
+                if not response.text:
+                    raise Exception("Empty response from Gemini AI")
+                
+                response_text = response.text
             
             # Parse the structured response
-            result = self._parse_gemini_response(response.text)
+            with span("parse.credibility"):
+                result = self._parse_gemini_response(response_text)
+            
+            # Only cache a completion that parsed as JSON, never a truncated or free-text one
+            if fresh and self._has_json(response_text):
+                await llm_cache.set(cache_key, response_text)
             
             logger.info(f"Gemini analysis completed. Credibility: {result.credibility_level}")
             return result
             
         except Exception as e:
             logger.error(f"Gemini AI analysis error: {e}")
+            if raise_errors:
+                raise
             return self._create_error_result(str(e))
     
-    def _prepare_twitter_context(self, twitter_data: List[Dict[str, Any]]) -> str:
+    async def stream_news_credibility(
+        self,
+        news_content: str,
+        twitter_data: List[Dict[str, Any]],
+        language: Optional[str] = None,
+        articles: Optional[Dict[str, str]] = None,
+        related: Optional[List[Tuple[str, FactCheckResult]]] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
         """
-        Prepare Twitter data for analysis
+        Schema-constrained analysis streamed from Gemini. Yields (field, value)
+        for each top-level field as soon as it is complete, in RESPONSE_FIELD_ORDER
+        (verdict first), then ("result", FactCheckResult). Raises on API errors.
         """
-        if not twitter_data:
-            return "No Twitter data available for analysis."
+        prompt = self._create_analysis_prompt(news_content, twitter_data, articles, language, related)
+        parser = IncrementalJSONObjectParser()
+        cache_key = llm_cache.make_key(
+            f"tier:{model_router.tier_for(GEMINI_STAGE)}", prompt, {"response_mime_type": "application/json"}
+        )
+        cached = await llm_cache.get(cache_key)
+        record_cache("llm", "miss" if cached is None else "hit")
         
+        if cached is not None:
+            for field in parser.feed(cached):
+                yield field
+        else:
+            payload = {
+                "contents": [{"parts": [{"text": prompt}]}],
+                "generationConfig": {
+                    "responseMimeType": "application/json",
+                    "responseSchema": fact_check_response_schema(),
+                },
+            }
+            with track("gemini", GEMINI_STAGE):
+                async for text in gemini_client.stream_text(GEMINI_STAGE, payload):
+                    for field in parser.feed(text):
+                        yield field
+        
+        with span("parse.credibility"):
+            result = self._result_from_dict(parser.result())
+        if cached is None:
+            # Cached only once the payload has parsed, so a truncated stream is never replayed
+            await llm_cache.set(cache_key, parser.buffer)
+        yield "result", result
+    
+    async def _generate_content(self, prompt: str):
+        """
+        Run the synchronous SDK call in the bounded worker pool
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.model.generate_content, prompt)
+    
+    def _prepare_twitter_context(self, twitter_data: List[Dict[str, Any]]) -> List[str]:
+        """
+        Format tweets for analysis, most engaged first (the prompt builder
+        keeps as many as fit the token budget)
+        """
+        ranked = sorted(
+            twitter_data, key=lambda tweet: calculate_engagement_score(tweet.get('public_metrics') or {}), reverse=True
+        )
         context_parts = []
-        for i, tweet in enumerate(twitter_data[:10], 1):  # Limit to 10 tweets
+        for i, tweet in enumerate(ranked, 1):
             tweet_text = tweet.get('text', '')
             author = tweet.get('author_username', 'unknown')
             metrics = tweet.get('public_metrics', {})
@@ -85,78 +261,98 @@ Content: {tweet_text}
 Engagement: {metrics.get('like_count', 0)} likes, {metrics.get('retweet_count', 0)} retweets
             """.strip())
         
-        return "\n\n".join(context_parts)
+        return context_parts
     
-    def _create_analysis_prompt(self, news_content: str, twitter_context: str) -> str:
+    def _create_analysis_prompt(
+        self,
+        news_content: str,
+        twitter_data: List[Dict[str, Any]],
+        articles: Optional[Dict[str, str]] = None,
+        language: Optional[str] = None,
+        related: Optional[List[Tuple[str, FactCheckResult]]] = None
+    ) -> str:
         """
-        Create a comprehensive analysis prompt for Gemini
+        Create a comprehensive analysis prompt for Gemini within the
+        "credibility" token budget: the claim first, then linked articles,
+        then tweets, then earlier verdicts on similar claims
         """
-        return f"""
-You are an expert fact-checker and news analyst. Analyze the following news content for credibility and truthfulness.
-
-NEWS CONTENT TO ANALYZE:
-{news_content}
-
-RELATED SOCIAL MEDIA CONTEXT:
-{twitter_context}
-
-Please provide a comprehensive analysis in the following JSON format:
-
-{{
-    "is_fake": boolean,
-    "credibility_level": "highly_credible" | "credible" | "questionable" | "likely_fake" | "fake",
-    "confidence_score": number between 0 and 1,
-    "reasoning": "detailed explanation of your assessment",
-    "analysis_details": "comprehensive analysis including methodology",
-    "key_findings": ["finding1", "finding2", "finding3"],
-    "contradictions_found": ["contradiction1", "contradiction2"],
-    "supporting_evidence": ["evidence1", "evidence2"]
-}}
-
-Analysis criteria:
-1. Factual accuracy and verifiability
-2. Source credibility and reliability
-3. Logical consistency and coherence
-4. Emotional manipulation or bias indicators
-5. Corroboration with social media discussions
-6. Timeline consistency
-7. Expert consensus (if applicable)
-
-Provide specific, actionable reasoning for your assessment. Be thorough but concise.
-"""
+        template = ANALYSIS_PROMPT
+        if language and language.lower() != "english":
+            language = language.replace("{", "{{").replace("}", "}}")
+            template += f"\nWrite all text fields of the JSON in {language}.\n"
+        return (
+            PromptBuilder("credibility", template)
+            .add("news_content", news_content, priority=0)
+            .add("articles", [f"({url})\n{text}" for url, text in (articles or {}).items()], priority=1,
+                 empty="No linked articles.")
+            .add("twitter_context", self._prepare_twitter_context(twitter_data), priority=2,
+                 empty="No Twitter data available for analysis.")
+            .add("related_analyses", [
+                f'Claim: "{claim}"\nVerdict: {result.credibility_level.value} '
+                f'(confidence {result.confidence_score:.2f})\nReasoning: {result.reasoning}'
+                for claim, result in related or []
+            ], priority=3, empty="None.")
+            .build()
+        )
     
     def _parse_gemini_response(self, response_text: str) -> FactCheckResult:
         """
-        Parse Gemini's structured response into FactCheckResult
+        Parse Gemini's structured response into FactCheckResult (keyword
+        fallback for non-JSON text); raises ValueError for unusable JSON
         """
         try:
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                parsed = json.loads(json_str)
-                
-                return FactCheckResult(
-                    is_fake=parsed.get('is_fake', False),
-                    credibility_level=CredibilityLevel(parsed.get('credibility_level', 'questionable')),
-                    confidence_score=float(parsed.get('confidence_score', 0.5)),
-                    reasoning=parsed.get('reasoning', 'Analysis completed'),
-                    sources_checked=["Twitter Social Media", "Gemini AI Analysis"],
-                    analysis_details=parsed.get('analysis_details', 'Comprehensive AI analysis performed'),
-                    key_findings=parsed.get('key_findings', []),
-                    contradictions_found=parsed.get('contradictions_found', []),
-                    supporting_evidence=parsed.get('supporting_evidence', [])
-                )
-            else:
-                # Fallback parsing if JSON extraction fails
-                return self._fallback_parse(response_text)
-                
-        except json.JSONDecodeError:
+            data = self._extract_json(response_text)
+        except ValueError:
             logger.warning("Failed to parse JSON response, using fallback parsing")
             return self._fallback_parse(response_text)
+        try:
+            return self._result_from_dict(data)
         except Exception as e:
-            logger.error(f"Error parsing Gemini response: {e}")
-            return self._create_error_result(f"Parsing error: {str(e)}")
+            raise ValueError(f"Parsing error: {e}") from e
+    
+    def _has_json(self, response_text: str) -> bool:
+        try:
+            self._extract_json(response_text)
+            return True
+        except ValueError:
+            return False
+    
+    def _extract_json(self, response_text: str) -> Dict[str, Any]:
+        """
+        Decode the analysis JSON object in the response, tolerating code fences
+        and surrounding prose; raises ValueError if there is no JSON object
+        """
+        decoder = json.JSONDecoder()
+        first = None
+        start = response_text.find("{")
+        while start != -1:
+            try:
+                parsed, end = decoder.raw_decode(response_text, start)
+                if isinstance(parsed, dict):
+                    if "credibility_level" in parsed or "is_fake" in parsed:
+                        return parsed
+                    first = first if first is not None else parsed
+                    start = response_text.find("{", end)
+                    continue
+            except json.JSONDecodeError:
+                pass
+            start = response_text.find("{", start + 1)
+        if first is None:
+            raise ValueError("No JSON object in response")
+        return first
+    
+    def _result_from_dict(self, parsed: Dict[str, Any]) -> FactCheckResult:
+        return FactCheckResult(
+            is_fake=parsed.get('is_fake', False),
+            credibility_level=CredibilityLevel(parsed.get('credibility_level', 'questionable')),
+            confidence_score=float(parsed.get('confidence_score', 0.5)),
+            reasoning=parsed.get('reasoning', 'Analysis completed'),
+            sources_checked=["Twitter Social Media", "Gemini AI Analysis"],
+            analysis_details=parsed.get('analysis_details', 'Comprehensive AI analysis performed'),
+            key_findings=parsed.get('key_findings', []),
+            contradictions_found=parsed.get('contradictions_found', []),
+            supporting_evidence=parsed.get('supporting_evidence', [])
+        )
     
     def _fallback_parse(self, response_text: str) -> FactCheckResult:
         """
@@ -176,11 +372,11 @@ Provide specific, actionable reasoning for your assessment. Be thorough but conc
         
         # Determine credibility level
         if is_fake:
-            credibility = CredibilityLevel.likely_fake
+            credibility = CredibilityLevel.LIKELY_FAKE
         elif confidence_score > 0.7:
-            credibility = CredibilityLevel.credible
+            credibility = CredibilityLevel.CREDIBLE
         else:
-            credibility = CredibilityLevel.questionable
+            credibility = CredibilityLevel.QUESTIONABLE
         
         return FactCheckResult(
             is_fake=is_fake,
@@ -200,7 +396,7 @@ Provide specific, actionable reasoning for your assessment. Be thorough but conc
         """
         return FactCheckResult(
             is_fake=False,
-            credibility_level=CredibilityLevel.questionable,
+            credibility_level=CredibilityLevel.QUESTIONABLE,
             confidence_score=0.0,
             reasoning=f"Analysis failed: {error_message}",
             sources_checked=[],
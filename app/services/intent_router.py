@@ -0,0 +1,147 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.core.tracing import is_tracing, span
+
+# ------------------------ 🧭 Intent Keyword Sets ------------------------
+# Lower priority number wins when a message matches several intents.
+
+# Route-level identity questions answered with the canned IDENTITY_RESPONSE
+IDENT_KEYWORDS = ["who are you", "what's your name", "tell me about yourself", "who is truthfinder", "what is your work"]
+GREETING_KEYWORDS = ["hello", "hi", "hey", "salaam", "assalam", "greetings"]
+ABOUT_KEYWORDS = ["who are you", "about you", "yourself"]
+NEWS_EVENT_KEYWORDS = [
+    "news", "breaking", "happened", "event", "incident", "attack", "war", "earthquake", "election", "trending", "protest", "riot", "conflict", "explosion", "disaster", "crisis", "shooting", "flood", "storm", "fire", "accident", "strike", "emergency"
+]
+SUMMARY_KEYWORDS = ["summarize", "summary", "short version", "tl;dr"]
+FACTCHECK_KEYWORDS = ["fact check", "is it true", "verify", "real or fake"]
+BIAS_KEYWORDS = ["bias", "political bias", "tone", "sentiment"]
+KEYWORD_KEYWORDS = ["keywords", "extract", "entities"]
+STAT_KEYWORDS = ["statistic", "number", "verify stat"]
+REPORT_KEYWORDS = ["report", "generate report", "final report"]
+TWITTER_KEYWORDS = ["twitter", "tweet", "social media"]
+
+# intent -> (priority, keywords, allow inflections such as "reports"/"verified")
+INTENTS: Dict[str, Tuple[int, List[str], bool]] = {
+    "profile": (0, IDENT_KEYWORDS, False),
+    "greeting": (1, GREETING_KEYWORDS, False),
+    "identity": (2, ABOUT_KEYWORDS, False),
+    "news_event": (3, NEWS_EVENT_KEYWORDS, True),
+    "summarize": (4, SUMMARY_KEYWORDS, True),
+    "factcheck": (5, FACTCHECK_KEYWORDS, True),
+    "bias": (6, BIAS_KEYWORDS, True),
+    "keywords": (7, KEYWORD_KEYWORDS, True),
+    "stat": (8, STAT_KEYWORDS, True),
+    "report": (9, REPORT_KEYWORDS, True),
+    "twitter": (10, TWITTER_KEYWORDS, True),
+}
+
+_INFLECTIONS = "s|es|d|ed|ing"
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    priority: int
+    keyword: str
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """
+    Build a regex alternation from a character trie of the keywords.
+
+    Shared prefixes are factored out ("h(?:e(?:llo|y)|i)"), so the regex
+    engine tests each position against a few branches instead of every
+    keyword. Optional tails are greedy, so the longest keyword wins
+    ("political bias" over "bias"). Spaces match any run of whitespace.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = []
+        for char, child in sorted(node.items()):
+            if char:
+                branches.append((r"\s+" if char == " " else re.escape(char)) + build(child))
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{pattern})?" if "" in node else pattern
+
+    return build(trie)
+
+
+class IntentRouter:
+    """
+    Precompiled, word-boundary intent matcher.
+
+    Every keyword of every intent is compiled into one trie-shaped regex, so
+    a message is scanned once; each hit is a single lookup of its prebuilt
+    matches, returned with their priorities. Keywords only match whole words ("hi" no longer matches inside
+    "this"); intents that allow it also match simple inflections ("reports",
+    "verified").
+    """
+
+    def __init__(self, intents: Dict[str, Tuple[int, List[str], bool]]):
+        self.priorities = {name: priority for name, (priority, _, _) in intents.items()}
+        # keyword -> [(intent, allows inflection)]; a phrase may belong to several intents
+        self.keywords: Dict[str, List[Tuple[str, bool]]] = {}
+        for name, (_, keywords, inflect) in intents.items():
+            for keyword in keywords:
+                self.keywords.setdefault(" ".join(keyword.lower().split()), []).append((name, inflect))
+        # Matched text (keyword, or keyword + inflection) -> the matches it yields, built
+        # once so match() does a single dict lookup per hit. Like the regex, the longest
+        # keyword wins when a text splits two ways; inflected text only yields intents
+        # that allow inflections
+        self.forms: Dict[str, Tuple[IntentMatch, ...]] = {}
+        for keyword in sorted(self.keywords, key=len):
+            entries = self.keywords[keyword]
+            inflected = tuple(IntentMatch(name, self.priorities[name], keyword) for name, inflect in entries if inflect)
+            for suffix in _INFLECTIONS.split("|"):
+                self.forms[keyword + suffix] = inflected
+        for keyword, entries in self.keywords.items():
+            self.forms[keyword] = tuple(IntentMatch(name, self.priorities[name], keyword) for name, _ in entries)
+
+        # Matched against the lowercased message, which is faster than re.IGNORECASE.
+        # No capture groups, so findall() returns plain strings
+        self.pattern = re.compile(rf"\b(?:{_trie_pattern(self.keywords)})(?:{_INFLECTIONS})?(?!\w)")
+
+    def match(self, message: str) -> List[IntentMatch]:
+        """
+        Every intent found in the message, highest priority first
+        """
+        found: Dict[str, IntentMatch] = {}
+        forms = self.forms
+        for text in self.pattern.findall(message.lower()):
+            matches = forms.get(text)
+            if matches is None:
+                # Phrase matched with extra whitespace between words
+                matches = forms[" ".join(text.split())]
+            for match in matches:
+                if match.intent not in found:
+                    found[match.intent] = match
+        if len(found) < 2:
+            return list(found.values())
+        return sorted(found.values(), key=lambda match: match.priority)
+
+    def best(self, message: str, allowed: Optional[Iterable[str]] = None) -> Optional[IntentMatch]:
+        matches = self.match(message)
+        if allowed is not None:
+            allowed = set(allowed)
+            matches = [m for m in matches if m.intent in allowed]
+        return matches[0] if matches else None
+
+
+intent_router = IntentRouter(INTENTS)
+
+
+def detect_intents(message: str) -> List[IntentMatch]:
+    if not is_tracing():
+        return intent_router.match(message)
+    with span("intent_routing") as trace_span:
+        matches = intent_router.match(message)
+        trace_span.set(intents=[m.intent for m in matches])
+    return matches
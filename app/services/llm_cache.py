@@ -0,0 +1,280 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_pruner_task: Optional[asyncio.Task] = None
+
+
+class LRUCache:
+    """
+    In-process LRU cache with a per-entry TTL
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    On-disk cache tier shared by all workers on a host, holding at most
+    `max_entries` rows. Rows over the cap (least recently used first) and
+    expired rows are removed by prune(), which runs periodically and after
+    every `prune_every` writes.
+    Methods are blocking; callers run them in a worker thread.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int, prune_every: int = 1000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.expirations = 0
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(llm_cache)")}
+        if "last_used" not in columns:
+            # Databases created before the size cap
+            self._conn.execute("ALTER TABLE llm_cache ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < time.time():
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.expirations += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl_seconds, now),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes < self.prune_every:
+                return
+        self.prune()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+            self.expirations += cursor.rowcount
+            return cursor.rowcount
+
+    def prune(self) -> int:
+        """Drop expired rows, then the least recently used ones over max_entries; returns how many went."""
+        removed = self.purge_expired()
+        with self._lock:
+            self._writes = 0
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if count <= self.max_entries:
+                return removed
+            cursor = self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            self._conn.commit()
+            self.evictions += cursor.rowcount
+            return removed + cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for LLM completions: memory LRU first, then optional SQLite
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        sqlite_path: Optional[str] = None,
+        enabled: bool = True,
+        sqlite_max_entries: int = 50000
+    ):
+        self.enabled = enabled
+        self.memory = LRUCache(max_entries, ttl_seconds)
+        self.disk: Optional[SQLiteCache] = None
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if enabled and sqlite_path:
+            try:
+                self.disk = SQLiteCache(sqlite_path, ttl_seconds, sqlite_max_entries)
+                logger.info(f"✅ LLM cache disk tier enabled at {sqlite_path}")
+            except Exception as e:
+                logger.error(f"❌ Failed to open LLM cache database {sqlite_path}: {e}")
+
+    @staticmethod
+    def make_key(model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build a cache key from the model, the normalized prompt hash and generation parameters
+        """
+        normalized = re.sub(r'\s+', ' ', prompt).strip()
+        prompt_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        raw = json.dumps({"model": model, "prompt": prompt_hash, "params": params or {}}, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            self.memory_hits += 1
+            return value
+
+        if self.disk is not None:
+            try:
+                value = await asyncio.to_thread(self.disk.get, key)
+            except Exception as e:
+                logger.error(f"❌ LLM cache disk read failed: {e}")
+                value = None
+            if value is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self.memory.set(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        if not self.enabled or not value:
+            return
+
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, key, value)
+            except Exception as e:
+                logger.error(f"❌ LLM cache disk write failed: {e}")
+
+    async def prune(self) -> int:
+        """Prune the disk tier (expired and over-cap rows) in a worker thread"""
+        if self.disk is None:
+            return 0
+        return await asyncio.to_thread(self.disk.prune)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.memory.evictions + (self.disk.evictions if self.disk else 0),
+            "expirations": self.memory.expirations + (self.disk.expirations if self.disk else 0),
+            "memory_entries": len(self.memory),
+            "disk_enabled": self.disk is not None,
+        }
+
+
+# Shared cache instance used by every Gemini caller
+llm_cache = LLMResponseCache(
+    max_entries=settings.llm_cache_max_entries,
+    ttl_seconds=settings.llm_cache_ttl_seconds,
+    sqlite_path=settings.llm_cache_sqlite_path,
+    enabled=settings.llm_cache_enabled,
+    sqlite_max_entries=settings.llm_cache_sqlite_max_entries,
+)
+
+
+async def _prune_forever(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await llm_cache.prune()
+            if removed:
+                logger.info(f"🧹 LLM cache: pruned {removed} disk entries")
+        except Exception as e:
+            logger.error(f"❌ LLM cache prune failed: {e}")
+
+
+def start_llm_cache_pruner():
+    """
+    Start the periodic pruning of the disk tier (called on app startup)
+    """
+    global _pruner_task
+    if llm_cache.disk is not None and (_pruner_task is None or _pruner_task.done()):
+        _pruner_task = asyncio.create_task(_prune_forever(settings.llm_cache_prune_interval_seconds))
+
+
+async def stop_llm_cache_pruner():
+    global _pruner_task
+    if _pruner_task is not None:
+        _pruner_task.cancel()
+        try:
+            await _pruner_task
+        except asyncio.CancelledError:
+            pass
+        _pruner_task = None
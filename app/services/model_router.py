@@ -0,0 +1,217 @@
+import logging
+import os
+import random
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.core.config import settings
+from app.utils.rate_limit import TokenBucket
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+# Weight of the error rate relative to latency when comparing keys or degraded models
+ERROR_WEIGHT = 4.0
+
+
+class Route(NamedTuple):
+    model: str
+    key_index: int
+    key: str
+
+    def url(self, method: str) -> str:
+        query = "alt=sse&" if method == "streamGenerateContent" else ""
+        return f"{GEMINI_API_BASE}/models/{self.model}:{method}?{query}key={self.key}"
+
+
+class NoCapacityError(Exception):
+    """Every configured API key is over its quota"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"All Gemini API keys are over quota; next slot in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class NoApiKeyError(Exception):
+    """No Gemini API key is configured"""
+
+
+class NoModelAvailableError(Exception):
+    """Every model of the stage's tier is unavailable (circuit open)"""
+
+
+class _Health:
+    """
+    Exponentially weighted latency and error rate of a model or key
+    """
+
+    __slots__ = ("latency", "error_rate", "samples")
+
+    def __init__(self, prior_latency: float):
+        self.latency = prior_latency
+        self.error_rate = 0.0
+        self.samples = 0
+
+    def record(self, latency: Optional[float], failed: bool):
+        alpha = settings.gemini_router_ewma_alpha
+        if latency is not None and not failed:
+            self.latency += alpha * (latency - self.latency)
+        self.error_rate += alpha * ((1.0 if failed else 0.0) - self.error_rate)
+        self.samples += 1
+
+    def score(self) -> float:
+        return self.latency * (1.0 + ERROR_WEIGHT * self.error_rate)
+
+    def stats(self) -> Dict[str, float]:
+        return {"latency_ewma": round(self.latency, 3), "error_rate": round(self.error_rate, 3), "samples": self.samples}
+
+
+class _KeyState:
+    __slots__ = ("key", "quota", "bucket", "health")
+
+    def __init__(self, key: str, quota: int):
+        self.key = key
+        self.quota = quota
+        self.bucket = TokenBucket(quota, 60.0)
+        self.health = _Health(settings.gemini_router_prior_latency_seconds)
+
+
+def parse_api_keys(keys: List[str], default_quota: int) -> List[Tuple[str, int]]:
+    """
+    "KEY" or "KEY:REQUESTS_PER_MINUTE" entries -> [(key, quota)]
+    """
+    parsed = []
+    for entry in keys:
+        key, _, quota = entry.strip().partition(":")
+        if key:
+            parsed.append((key, int(quota) if quota.isdigit() else default_quota))
+    return parsed
+
+
+class ModelRouter:
+    """
+    Picks the Gemini model and API key for each call.
+
+    Each stage maps to a tier (e.g. "lite" for summaries, "strong" for the
+    credibility analysis) listing models in preference order. The first
+    model that is neither unavailable (circuit open) nor degraded (error rate
+    or latency over the configured limits) is used; a small share of calls
+    still probes degraded models so their stats can recover. Keys are picked
+    at random among those with quota left, weighted by remaining quota and
+    observed health, so load spreads across keys instead of exhausting one.
+    """
+
+    def __init__(
+        self,
+        keys: List[Tuple[str, int]],
+        tiers: Dict[str, List[str]],
+        stage_tiers: Dict[str, str],
+        default_tier: str = "standard"
+    ):
+        self.keys = [_KeyState(key, quota) for key, quota in keys]
+        self.tiers = tiers
+        self.stage_tiers = stage_tiers
+        self.default_tier = default_tier
+        self.model_health: Dict[str, _Health] = {}
+        self.quota_rejections = 0
+
+    def tier_for(self, stage: str) -> str:
+        tier = self.stage_tiers.get(stage, self.default_tier)
+        return tier if tier in self.tiers else self.default_tier
+
+    def models_for(self, stage: str) -> List[str]:
+        return self.tiers.get(self.tier_for(stage)) or self.tiers[self.default_tier]
+
+    def _health(self, model: str) -> _Health:
+        health = self.model_health.get(model)
+        if health is None:
+            health = self.model_health[model] = _Health(settings.gemini_router_prior_latency_seconds)
+        return health
+
+    def _degraded(self, health: _Health, latency_limit: float) -> bool:
+        if health.samples < settings.gemini_router_min_samples:
+            return False
+        return health.error_rate > settings.gemini_router_max_error_rate or health.latency > latency_limit
+
+    def choose_model(
+        self, stage: str, latency_limit: float, is_available: Callable[[str], bool] = lambda model: True
+    ) -> str:
+        candidates = [model for model in self.models_for(stage) if is_available(model)]
+        if not candidates:
+            raise NoModelAvailableError(f"No model available for tier '{self.tier_for(stage)}'")
+        healthy = [model for model in candidates if not self._degraded(self._health(model), latency_limit)]
+        if healthy and (len(healthy) == len(candidates) or random.random() >= settings.gemini_router_probe_rate):
+            return healthy[0]
+        degraded = [model for model in candidates if model not in healthy]
+        if healthy:
+            return random.choice(degraded)  # probe
+        return min(candidates, key=lambda model: self._health(model).score())
+
+    def choose_key(self) -> Tuple[int, _KeyState]:
+        available = [(index, state) for index, state in enumerate(self.keys) if state.bucket.remaining >= 1]
+        if not available:
+            self.quota_rejections += 1
+            raise NoCapacityError(min(state.bucket.seconds_until_available() for state in self.keys))
+        weights = [state.bucket.remaining / state.health.score() for _, state in available]
+        index, state = random.choices(available, weights=weights)[0]
+        state.bucket.try_acquire()
+        return index, state
+
+    def choose(
+        self, stage: str, latency_limit: float, is_available: Callable[[str], bool] = lambda model: True
+    ) -> Route:
+        """
+        Route for one request attempt; consumes one unit of the chosen key's quota
+        """
+        if not self.keys:
+            raise NoApiKeyError("No Gemini API key configured")
+        model = self.choose_model(stage, latency_limit, is_available)
+        index, state = self.choose_key()
+        return Route(model, index, state.key)
+
+    def record(self, route: Route, latency: Optional[float], failed: bool, rate_limited: bool = False,
+               retry_after: Optional[float] = None):
+        """
+        Feed back the outcome of an attempt. A 429 pauses only that key; it
+        does not count against the model's health.
+        """
+        key_state = self.keys[route.key_index]
+        key_state.health.record(latency, failed)
+        if rate_limited:
+            key_state.bucket.exhaust(time.time() + (retry_after if retry_after is not None else 60.0))
+            logger.warning(f"🔑 Gemini key #{route.key_index} hit its rate limit; pausing it")
+        else:
+            self._health(route.model).record(latency, failed)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "keys": [
+                {"quota_per_minute": state.quota, "remaining": round(state.bucket.remaining, 1), **state.health.stats()}
+                for state in self.keys
+            ],
+            "models": {model: health.stats() for model, health in self.model_health.items()},
+            "stage_tiers": {stage: self.tier_for(stage) for stage in self.stage_tiers},
+            "quota_rejections": self.quota_rejections,
+        }
+
+
+def _configured_keys() -> List[Tuple[str, int]]:
+    entries = list(settings.gemini_api_keys)
+    single_key = settings.gemini_api_key or os.getenv("gemini_api_key")
+    if not entries and single_key:
+        entries = [single_key]
+    if not entries:
+        logger.warning("⚠️ No Gemini API key configured. Gemini REST calls will fail.")
+    return parse_api_keys(entries, settings.gemini_key_requests_per_minute)
+
+
+# Shared router used by every Gemini caller
+model_router = ModelRouter(
+    keys=_configured_keys(),
+    tiers=settings.gemini_model_tiers,
+    stage_tiers=settings.gemini_stage_tiers,
+)
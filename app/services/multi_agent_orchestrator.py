@@ -1,27 +1,42 @@
 import os
+import re
+import logging
 import httpx
 import json
+from typing import AsyncIterator, List, Optional
 from dotenv import load_dotenv
+from app.core.config import settings
+from app.core.http_client import get_http_client, stage_timeout
+from app.services.agent_pipeline import PipelineStep, run_pipeline
+from app.services.llm_cache import llm_cache
+from app.core.metrics import record_cache, track
+from app.core.tracing import annotate, span
+from app.services.gemini_client import gemini_client
+from app.services.model_router import model_router
+from app.services.prompt_builder import PromptBuilder
+from app.utils.helpers import calculate_engagement_score
+from app.utils.singleflight import SingleFlight
 from app.services.tools import TRUTHFINDER_TOOLS
 
 load_dotenv()
-GEMINI_API_KEY = os.getenv("gemini_api_key")
+logger = logging.getLogger(__name__)
+SENSITIVE_TOPIC_REPLY = "Sorry, this topic seems too sensitive for the AI to respond to. Please try rephrasing or ask about something else."
+UNAVAILABLE_REPLY = "The AI service is busy or temporarily unavailable. Please try again in a moment."
+ERROR_REPLY = "Sorry, something went wrong while generating a response. Please try again."
 
-GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
+# Greeting and news event keywords live with the shared intent router
+from app.services.intent_router import GREETING_KEYWORDS, NEWS_EVENT_KEYWORDS, IntentMatch, detect_intents
 
-# Add greeting keywords
-GREETING_KEYWORDS = ["hello", "hi", "hey", "salaam", "assalam", "greetings"]
-
-# Add news event keywords for intent detection
-NEWS_EVENT_KEYWORDS = [
-    "news", "breaking", "happened", "event", "incident", "attack", "war", "earthquake", "election", "trending", "protest", "riot", "conflict", "explosion", "disaster", "crisis", "shooting", "flood", "storm", "fire", "accident", "strike", "emergency"
-]
+# Intents the orchestrator can route to (everything else falls back to general chat)
+ORCHESTRATOR_ROUTES = {
+    "greeting", "identity", "news_event", "summarize", "factcheck",
+    "bias", "keywords", "stat", "report", "twitter",
+}
 
 from app.services.tools import search_twitter
 
 # ------------------------ 🔧 Sub-Agent: Fact-Checker ------------------------
-async def factcheck_agent(news_text: str) -> str:
-    prompt = f"""
+FACTCHECK_PROMPT = """
 You are a fact-checking AI agent. Analyze the following news and respond if it's real, fake, biased, or misleading. 
 Also give a short reasoning for your conclusion.
 
@@ -30,7 +45,10 @@ News:
 
 Give final verdict and explain why.
 """
-    return await call_gemini_api(prompt)
+
+async def factcheck_agent(news_text: str) -> str:
+    prompt = PromptBuilder("factcheck", FACTCHECK_PROMPT).add("news_text", news_text, priority=0).build()
+    return await call_gemini_api(prompt, stage="factcheck")
 
 # ------------------------ ✂️ Sub-Agent: Summarizer ------------------------
 async def summarizer_agent(text: str) -> str:
@@ -42,64 +60,112 @@ Text:
 
 Return a 3-5 sentence summary.
 """
-    return await call_gemini_api(prompt)
+    return await call_gemini_api(prompt, stage="summarizer")
 
 # ------------------------ 📰 Sub-Agent: News Event Analyzer ------------------------
 async def news_event_agent(user_message: str) -> str:
     """
     Sub-agent for news event queries: fetches Twitter data and combines it with LLM analysis.
     """
+    prompt = await _news_event_prompt(user_message)
+    return await call_gemini_api(prompt, stage="news_event")
+
+NEWS_EVENT_PROMPT = (
+    "You are TruthFinder, an AI assistant that analyzes news events using both news and social media data. "
+    "Below is a user question about a recent event, and some recent tweets about the topic. "
+    "Use both sources to provide a comprehensive, up-to-date answer.\n\n"
+    "User question: {user_message}\n\n"
+    "Recent tweets:\n{twitter_context}\n\n"
+    "Answer:"
+)
+
+async def _news_event_prompt(user_message: str) -> str:
     # Extract keywords (simple approach: use the user message directly)
     keywords = user_message
     # Fetch recent tweets
     tweets = await search_twitter(keywords, max_results=10)
-    # Format tweets for LLM context
-    if tweets:
-        twitter_context = "\n\n".join([
-            f"Tweet by @{t.author_username}: {t.text}" for t in tweets
-        ])
-    else:
-        twitter_context = "No relevant tweets found."
-    # Compose prompt for LLM
-    prompt = (
-        "You are TruthFinder, an AI assistant that analyzes news events using both news and social media data. "
-        "Below is a user question about a recent event, and some recent tweets about the topic. "
-        "Use both sources to provide a comprehensive, up-to-date answer.\n\n"
-        f"User question: {user_message}\n\n"
-        f"Recent tweets:\n{twitter_context}\n\n"
-        "Answer:"
+    # Most engaged tweets first; the prompt builder keeps as many as fit the budget
+    tweets = sorted(tweets, key=lambda t: calculate_engagement_score(t.public_metrics), reverse=True)
+    return (
+        PromptBuilder("news_event", NEWS_EVENT_PROMPT)
+        .add("user_message", user_message, priority=0)
+        .add("twitter_context", [f"Tweet by @{t.author_username}: {t.text}" for t in tweets], priority=1,
+             empty="No relevant tweets found.")
+        .build()
     )
-    return await call_gemini_api(prompt)
 
 # ------------------------ 🔁 Utility: Gemini API Caller ------------------------
-async def call_gemini_api(prompt: str) -> str:
+def reply_for_error(error: Exception) -> str:
+    """
+    User-facing reply for a failed Gemini call: only real safety blocks are
+    reported as a sensitive topic
+    """
+    kind = getattr(error, "kind", "error")
+    if kind == "safety":
+        return SENSITIVE_TOPIC_REPLY
+    if kind in ("transient", "unavailable"):
+        return UNAVAILABLE_REPLY
+    return ERROR_REPLY
+
+async def call_gemini_api(prompt: str, stage: str = "fallback") -> str:
+    payload = {
+        "contents": [{"parts": [{"text": prompt}]}]
+    }
+    # Keyed by tier: any model of the tier may have produced the cached answer
+    cache_key = llm_cache.make_key(f"tier:{model_router.tier_for(stage)}", prompt)
+    cached = await llm_cache.get(cache_key)
+    record_cache("llm", "miss" if cached is None else "hit")
+    if cached is not None:
+        return cached
+    try:
+        with track("gemini", stage):
+            text = await gemini_client.generate_text(stage, payload)
+    except Exception as e:
+        logger.error(f"❌ Gemini call failed ({stage}, {getattr(e, 'kind', 'error')}): {e}")
+        return reply_for_error(e)
+    await llm_cache.set(cache_key, text)
+    return text
+
+async def stream_gemini_api(prompt: str, stage: str = "fallback") -> AsyncIterator[str]:
+    """
+    Stream a Gemini completion via streamGenerateContent (SSE), yielding text chunks as they arrive
+    """
+    cache_key = llm_cache.make_key(f"tier:{model_router.tier_for(stage)}", prompt)
+    cached = await llm_cache.get(cache_key)
+    record_cache("llm", "miss" if cached is None else "hit")
+    if cached is not None:
+        yield cached
+        return
+
     payload = {
         "contents": [{"parts": [{"text": prompt}]}]
     }
+    parts = []
     try:
-        async with httpx.AsyncClient() as client:
-            res = await client.post(GEMINI_URL, json=payload)
-            try:
-                res.raise_for_status()
-            except httpx.HTTPStatusError as e:
-                return "Sorry, this topic seems too sensitive for the AI to respond to. Please try rephrasing or ask about something else."
-            data = res.json()
-            text = data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
-            if not text:
-                return "Sorry, this topic seems too sensitive for the AI to respond to. Please try rephrasing or ask about something else."
-            return text
+        with track("gemini", stage):
+            async for text in gemini_client.stream_text(stage, payload):
+                parts.append(text)
+                yield text
     except Exception as e:
-        return "Sorry, this topic seems too sensitive for the AI to respond to. Please try rephrasing or ask about something else."
+        logger.error(f"❌ Gemini stream failed ({stage}, {getattr(e, 'kind', 'error')}): {e}")
+        if not parts:
+            yield reply_for_error(e)
+        return
+
+    text = "".join(parts).strip()
+    if text:
+        await llm_cache.set(cache_key, text)
 
 # Main TruthFinderAgent class
 class TruthFinderAgent:
     def __init__(self, tools):
-        self.tools = {getattr(tool, 'name', tool.__class__.__name__): tool for tool in tools}
+        self.tools = {getattr(tool, 'name', getattr(tool, '__name__', tool.__class__.__name__)): tool for tool in tools}
 
     async def handle(self, user_input: str, tool_name: str = None, **kwargs):
         if tool_name and tool_name in self.tools:
             tool = self.tools[tool_name]
-            return await tool(**kwargs)
+            with span(f"agent.{tool_name}"):
+                return await tool(**kwargs)
         # Default: Use orchestrator logic to pick tool
         return await multi_agent_orchestrator(user_input)
 
@@ -112,18 +178,25 @@ class MultiAgentOrchestrator:
     async def analyze_news(self, content: str, language: str = "english") -> dict:
         """Analyze news content using multiple agents"""
         try:
-            # Get fact check
-            fact_check = await factcheck_agent(content)
-            
-            # Get summary
-            summary = await summarizer_agent(content)
+            # Fact check and summary are independent; run them side by side
+            pipeline = await run_pipeline([
+                PipelineStep("fact_check", lambda _: factcheck_agent(content),
+                             timeout=settings.gemini_stage_timeouts.get("factcheck")),
+                PipelineStep("summary", lambda _: summarizer_agent(content),
+                             timeout=settings.gemini_stage_timeouts.get("summarizer")),
+            ])
+            if not pipeline.results:
+                raise Exception("; ".join(f"{name}: {error}" for name, error in pipeline.errors.items()))
             
-            return {
-                "fact_check": fact_check,
-                "summary": summary,
+            response = {
+                "fact_check": pipeline.get("fact_check"),
+                "summary": pipeline.get("summary"),
                 "language": language,
-                "status": "completed"
+                "status": "completed" if pipeline.ok else "partial"
             }
+            if pipeline.errors:
+                response["errors"] = pipeline.errors
+            return response
         except Exception as e:
             return {
                 "error": str(e),
@@ -133,43 +206,105 @@ class MultiAgentOrchestrator:
 # Instantiate the main agent with all tools
 main_agent = TruthFinderAgent(TRUTHFINDER_TOOLS)
 
+async def _report_pipeline(user_message: str) -> str:
+    """
+    Summary, verdict and keywords run concurrently; the report is built from whatever succeeded.
+    """
+    pipeline = await run_pipeline([
+        PipelineStep("summary", lambda _: main_agent.handle(user_message, tool_name="summarize_news", news_text=user_message)),
+        PipelineStep("verdict", lambda _: main_agent.handle(user_message, tool_name="fact_checker", claim=user_message)),
+        PipelineStep("keywords", lambda _: main_agent.handle(user_message, tool_name="extract_keywords", text=user_message)),
+        PipelineStep(
+            "report",
+            lambda r: main_agent.handle(
+                user_message,
+                tool_name="generate_report",
+                summary=r.get("summary", "Summary unavailable."),
+                verdict=r.get("verdict", "Verdict unavailable."),
+                keywords=r.get("keywords", []),
+            ),
+            depends_on=["summary", "verdict", "keywords"],
+        ),
+    ])
+    if "report" not in pipeline.results:
+        raise Exception(f"Report generation failed: {pipeline.errors.get('report')}")
+    return pipeline.results["report"]
+
+# Concurrent identical messages share one orchestrator run
+orchestrator_flight = SingleFlight("orchestrator")
+
+def _normalize_message(user_message: str) -> str:
+    return re.sub(r'\s+', ' ', user_message).strip().lower()
+
+async def multi_agent_orchestrator(user_message: str, intents: Optional[List[IntentMatch]] = None) -> str:
+    with span("orchestrator"):
+        return await orchestrator_flight.do(_normalize_message(user_message), _run_orchestrator, user_message, intents)
+
+GREETING_REPLY = "Hello! 👋 I'm TruthFinder. How can I help you with news, fact-checking, or analysis today?"
+IDENTITY_REPLY = (
+    "I'm Truth Finder Agent, made by Hamza Ahmed. "
+    "I help you fact-check news and analyze information using advanced AI and social media data. "
+    "Ask me about any news, and I'll help you verify its credibility!"
+)
+
+def _detect_route(user_message: str, intents: Optional[List[IntentMatch]] = None) -> str:
+    """
+    Pick the agent/tool that should handle a message: the highest-priority matched intent
+    """
+    if intents is None:
+        intents = detect_intents(user_message)
+    route = next((match.intent for match in intents if match.intent in ORCHESTRATOR_ROUTES), "fallback")
+    annotate(route=route)
+    return route
+
+def _fallback_prompt(user_message: str) -> str:
+    return (
+        "You are TruthFinder, an AI assistant that analyzes news, detects misinformation, summarizes content, "
+        "and explains findings. You never mention Google or Gemini. Stay in character as TruthFinder.\n"
+        f"User: {user_message}\nAssistant:"
+    )
+
 # Update orchestrator to use tools and allow handoff
-async def multi_agent_orchestrator(user_message: str) -> str:
-    # Example intent detection (expand as needed)
-    lower_msg = user_message.lower()
-    if any(k in lower_msg for k in GREETING_KEYWORDS):
-        return "Hello! 👋 I'm TruthFinder. How can I help you with news, fact-checking, or analysis today?"
-    if any(k in lower_msg for k in ["who are you", "about you", "yourself"]):
-        return (
-            "I'm Truth Finder Agent, made by Hamza Ahmed. "
-            "I help you fact-check news and analyze information using advanced AI and social media data. "
-            "Ask me about any news, and I'll help you verify its credibility!"
-        )
-    # News event intent detection and handoff
-    elif any(k in lower_msg for k in NEWS_EVENT_KEYWORDS):
+async def _run_orchestrator(user_message: str, intents: Optional[List[IntentMatch]] = None) -> str:
+    route = _detect_route(user_message, intents)
+    if route == "greeting":
+        return GREETING_REPLY
+    if route == "identity":
+        return IDENTITY_REPLY
+    elif route == "news_event":
         return await news_event_agent(user_message)
-    elif any(k in lower_msg for k in ["summarize", "summary", "short version", "tl;dr"]):
+    elif route == "summarize":
         return await main_agent.handle(user_message, tool_name="summarize_news", news_text=user_message)
-    elif any(k in lower_msg for k in ["fact check", "is it true", "verify", "real or fake"]):
+    elif route == "factcheck":
         return await main_agent.handle(user_message, tool_name="fact_checker", claim=user_message)
-    elif any(k in lower_msg for k in ["bias", "political bias", "tone", "sentiment"]):
+    elif route == "bias":
         return await main_agent.handle(user_message, tool_name="analyze_sentiment", text=user_message)
-    elif any(k in lower_msg for k in ["keywords", "extract", "entities"]):
+    elif route == "keywords":
         return await main_agent.handle(user_message, tool_name="extract_keywords", text=user_message)
-    elif any(k in lower_msg for k in ["statistic", "number", "verify stat"]):
+    elif route == "stat":
         return await main_agent.handle(user_message, tool_name="verify_stat", stat=user_message)
-    elif any(k in lower_msg for k in ["report", "generate report", "final report"]):
-        summary = await main_agent.handle(user_message, tool_name="summarize_news", news_text=user_message)
-        verdict = await main_agent.handle(user_message, tool_name="fact_checker", claim=user_message)
-        keywords = await main_agent.handle(user_message, tool_name="extract_keywords", text=user_message)
-        return await main_agent.handle(user_message, tool_name="generate_report", summary=summary, verdict=verdict, keywords=keywords)
-    elif any(k in lower_msg for k in ["twitter", "tweet", "social media"]):
+    elif route == "report":
+        return await _report_pipeline(user_message)
+    elif route == "twitter":
         return await main_agent.handle(user_message, tool_name="search_twitter", keyword=user_message)
     else:
         # Fallback: Use Gemini LLM for general chat
-        prompt = (
-            "You are TruthFinder, an AI assistant that analyzes news, detects misinformation, summarizes content, "
-            "and explains findings. You never mention Google or Gemini. Stay in character as TruthFinder.\n"
-            f"User: {user_message}\nAssistant:"
-        )
-        return await call_gemini_api(prompt) 
\ No newline at end of file
+        return await call_gemini_api(_fallback_prompt(user_message), stage="fallback")
+
+async def stream_multi_agent_orchestrator(user_message: str, intents: Optional[List[IntentMatch]] = None) -> AsyncIterator[str]:
+    """
+    Streaming variant of the orchestrator. LLM-backed routes forward Gemini
+    tokens as they arrive; tool routes yield their full reply as one chunk.
+    """
+    with span("orchestrator", streaming=True):
+        route = _detect_route(user_message, intents)
+        if route == "news_event":
+            prompt = await _news_event_prompt(user_message)
+            async for chunk in stream_gemini_api(prompt, stage="news_event"):
+                yield chunk
+        elif route == "fallback":
+            async for chunk in stream_gemini_api(_fallback_prompt(user_message), stage="fallback"):
+                yield chunk
+        else:
+            reply = await multi_agent_orchestrator(user_message, intents)
+            yield reply if isinstance(reply, str) else str(reply)
@@ -1,14 +1,261 @@
 # NOTE: Input and output guardrails are enforced at the route level (fact_check.py). This service assumes sanitized and safe input.
 import os
+import re
+import asyncio
+import logging
 import httpx
+from typing import Any, Dict, List, Tuple
 from dotenv import load_dotenv
+from pydantic import ValidationError
+from app.core.config import settings
+from app.core.metrics import collect_request_metrics, record_cache
+from app.models.response_models import AnalysisMetrics, CredibilityLevel, FactCheckResult, NewsAnalysisResponse
+from app.services.agent_pipeline import PipelineStep, run_pipeline
+from app.services.gemini_service import GeminiService
+from app.services.semantic_cache import SemanticMatch, same_facts, semantic_cache
 from app.services.multi_agent_orchestrator import multi_agent_orchestrator
+from app.services.tools import twitter
+from app.utils.helpers import extract_keywords, extract_text_from_url, summarize_text
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+URL_PATTERN = re.compile(r"https?://[^\s<>\"'()\[\]]+")
+
 class NewsAnalyzer:
     def __init__(self):
         self.orchestrator = multi_agent_orchestrator
+        self.gemini = GeminiService()
+
+    async def analyze_news_advanced(self, content: str, language: str = "english") -> NewsAnalysisResponse:
+        """
+        Fact-check content against its linked articles and related tweets.
+
+        Article extraction and the Twitter search run concurrently within
+        settings.fact_check_evidence_budget_seconds; Gemini then gets whatever
+        evidence arrived and the rest of settings.fact_check_budget_seconds.
+        If the budget runs out first, the evidence gathered so far is returned
+        with an inconclusive verdict, so the request never outlives the budget.
+
+        A claim that closely paraphrases a recently analyzed one, with the same
+        numbers, negations, language and links, reuses that verdict; similar ones are handed to Gemini as context.
+
+        The response metrics break down time, calls, errors and cache hits per
+        component (Gemini, Twitter, article fetching and parsing).
+        """
+        with collect_request_metrics() as request_metrics:
+            response = await self._analyze(content, language)
+        metrics = response.metrics
+        metrics.api_calls_made = request_metrics.api_calls
+        metrics.component_timings = {name: round(seconds, 3) for name, seconds in request_metrics.timings.items()}
+        metrics.component_calls = dict(request_metrics.calls)
+        metrics.component_errors = dict(request_metrics.errors)
+        metrics.cache_hits = dict(request_metrics.cache_hits)
+        metrics.cache_misses = dict(request_metrics.cache_misses)
+        return response
+
+    async def _analyze(self, content: str, language: str) -> NewsAnalysisResponse:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        claim = " ".join(URL_PATTERN.sub(" ", content).split())
+        urls = list(dict.fromkeys(URL_PATTERN.findall(content)))
+        # A verdict is only reused verbatim for the same language and linked URLs
+        context = " ".join([language] + sorted(urls))
+        matches = await asyncio.to_thread(
+            semantic_cache.lookup,
+            claim, settings.semantic_cache_top_k, min_similarity=settings.semantic_cache_seed_threshold
+        )
+        verdicts = self._cached_verdicts(matches)
+        reuse = (
+            bool(verdicts)
+            and verdicts[0][0].similarity >= settings.semantic_cache_reuse_threshold
+            and verdicts[0][0].context == context
+            and same_facts(claim, verdicts[0][0].claim)
+        )
+        record_cache("semantic", "hit" if reuse else "miss")
+        if reuse:
+            return self._reused_response(content, *verdicts[0], loop.time() - started)
+        related = [(match.claim, verdict) for match, verdict in verdicts]
+        deadline = started + settings.fact_check_budget_seconds
+        evidence_timeout = min(settings.fact_check_evidence_budget_seconds, settings.fact_check_budget_seconds)
+
+        urls = urls[:settings.fact_check_max_urls]
+        query = " ".join(extract_keywords(URL_PATTERN.sub(" ", content), max_keywords=4))
+        degraded: List[str] = []
+        early_fields: Dict[str, Any] = {}
+
+        async def articles(_inputs):
+            return await self._extract_articles(urls, evidence_timeout, degraded)
+
+        async def tweets(_inputs):
+            if not query or not twitter.is_available:
+                return []
+            return await twitter.search_tweets(query, settings.fact_check_max_tweets)
+
+        async def credibility(inputs):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            articles = inputs.get("articles") or {}
+            tweet_data = [tweet.dict() for tweet in inputs.get("tweets") or []]
+            return await asyncio.wait_for(
+                self._analyze_credibility(content, tweet_data, articles, related, language, early_fields),
+                timeout=remaining
+            )
+
+        # Evidence steps enforce their own budget (articles keep partial results);
+        # the step timeouts are only a backstop
+        result = await run_pipeline([
+            PipelineStep("articles", articles, timeout=settings.fact_check_budget_seconds),
+            PipelineStep("tweets", tweets, timeout=evidence_timeout),
+            PipelineStep("credibility", credibility, depends_on=["articles", "tweets"],
+                         timeout=settings.fact_check_budget_seconds),
+        ])
+        for name in result.errors:
+            if name not in degraded:
+                degraded.append(name)
+
+        article_texts: Dict[str, str] = result.get("articles") or {}
+        tweet_list = result.get("tweets") or []
+        sources = list(article_texts) + (["Twitter Social Media"] if tweet_list else [])
+
+        fact_check_result = result.get("credibility")
+        if fact_check_result is None:
+            logger.warning(f"⏱️ Fact-check degraded ({', '.join(degraded)}); returning evidence gathered so far")
+            fact_check_result = self._partial_result(
+                degraded, sources, len(article_texts), len(tweet_list), early_fields
+            )
+        else:
+            fact_check_result.sources_checked = list(dict.fromkeys(fact_check_result.sources_checked + sources))
+
+        complete = "credibility" in result.results
+        if complete and fact_check_result.confidence_score > 0:
+            await asyncio.to_thread(semantic_cache.add, claim, fact_check_result.model_dump_json(), context)
+            await semantic_cache.save()
+        return NewsAnalysisResponse(
+            success=complete,
+            message="Analysis completed" if complete else "Partial analysis: latency budget exhausted or analysis failed",
+            original_content=content,
+            content_summary=summarize_text(URL_PATTERN.sub("", content)),
+            twitter_data=tweet_list,
+            fact_check_result=fact_check_result,
+            metrics=AnalysisMetrics(
+                processing_time=round(loop.time() - started, 3),
+                tweets_analyzed=len(tweet_list),
+                sources_consulted=len(sources),
+                api_calls_made=0,
+                stage_timings={name: round(seconds, 3) for name, seconds in result.timings.items()},
+                degraded_stages=degraded,
+            ),
+        )
+
+    async def _analyze_credibility(
+        self,
+        news_content: str,
+        tweet_data: List[dict],
+        articles: Dict[str, str],
+        related: List[Tuple[str, FactCheckResult]],
+        language: str,
+        early_fields: Dict[str, Any]
+    ) -> FactCheckResult:
+        """
+        Run the Gemini analysis, recording verdict fields in early_fields as they
+        stream in so a budget timeout can still report them. Raises on failure,
+        so the pipeline marks the credibility stage as degraded.
+        """
+        if not (settings.gemini_structured_output and self.gemini.is_available):
+            return await self.gemini.analyze_news_credibility(
+                news_content, tweet_data, language, articles, related, raise_errors=True
+            )
+        async for name, value in self.gemini.stream_news_credibility(
+            news_content, tweet_data, language, articles, related
+        ):
+            if name == "result":
+                return value
+            early_fields[name] = value
+        raise RuntimeError("Incomplete structured response from Gemini AI")
+
+    @staticmethod
+    def _cached_verdicts(matches: List[SemanticMatch]) -> List[Tuple[SemanticMatch, FactCheckResult]]:
+        """Parse the cached verdicts of the matches, skipping stale or corrupt entries"""
+        verdicts = []
+        for match in matches:
+            try:
+                verdicts.append((match, FactCheckResult.model_validate_json(match.value)))
+            except ValidationError as e:
+                logger.warning(f"⚠️ Skipping unreadable semantic cache entry for '{match.claim[:60]}': {e.error_count()} errors")
+        return verdicts
+
+    def _reused_response(
+        self, content: str, match: SemanticMatch, fact_check_result: FactCheckResult, elapsed: float
+    ) -> NewsAnalysisResponse:
+        logger.info(f"♻️ Reusing verdict for similar claim ({match.similarity:.2f}): {match.claim[:60]}")
+        return NewsAnalysisResponse(
+            success=True,
+            message=f"Reused the analysis of a similar claim (similarity {match.similarity:.2f})",
+            original_content=content,
+            content_summary=summarize_text(URL_PATTERN.sub("", content)),
+            fact_check_result=fact_check_result,
+            metrics=AnalysisMetrics(
+                processing_time=round(elapsed, 3),
+                tweets_analyzed=0,
+                sources_consulted=len(fact_check_result.sources_checked),
+                api_calls_made=0,
+                stage_timings={"semantic_cache": round(elapsed, 3)},
+            ),
+        )
+
+    async def _extract_articles(self, urls: List[str], timeout: float, degraded: List[str]) -> Dict[str, str]:
+        """
+        Fetch linked articles concurrently; keep the ones that finish in time
+        """
+        if not urls:
+            return {}
+        tasks = {asyncio.create_task(extract_text_from_url(url)): url for url in urls}
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            degraded.append("articles")
+            logger.warning(f"⏱️ {len(pending)} of {len(urls)} article fetches missed the evidence budget")
+        return {
+            tasks[task]: task.result()
+            for task in done
+            if not task.cancelled() and task.exception() is None and task.result()
+        }
+
+    def _partial_result(
+        self, degraded: List[str], sources: List[str], articles: int, tweets: int, early_fields: Dict[str, Any]
+    ) -> FactCheckResult:
+        try:
+            # The verdict streams first; keep it if it arrived before the budget ran out
+            verdict = FactCheckResult(
+                is_fake=early_fields["is_fake"],
+                credibility_level=CredibilityLevel(early_fields["credibility_level"]),
+                confidence_score=float(early_fields["confidence_score"]),
+                reasoning="The verdict arrived but the detailed analysis was cut short (latency budget or error).",
+                sources_checked=sources + ["Gemini AI Analysis"],
+                analysis_details=f"Partial analysis; incomplete stages: {', '.join(degraded)}",
+                key_findings=early_fields.get("key_findings", []),
+                contradictions_found=early_fields.get("contradictions_found", []),
+                supporting_evidence=early_fields.get("supporting_evidence", [])
+            )
+            return verdict
+        except (KeyError, TypeError, ValueError):
+            pass
+        return FactCheckResult(
+            is_fake=False,
+            credibility_level=CredibilityLevel.QUESTIONABLE,
+            confidence_score=0.0,
+            reasoning="The AI analysis failed or did not complete within the latency budget; no verdict could "
+                      "be reached. The evidence gathered so far is attached.",
+            sources_checked=sources,
+            analysis_details=f"Partial analysis; incomplete stages: {', '.join(degraded)}",
+            key_findings=[f"{articles} linked article(s) retrieved", f"{tweets} related tweet(s) found"],
+            contradictions_found=[],
+            supporting_evidence=[]
+        )
 
     async def analyze_news(self, news_text: str) -> str:
         """
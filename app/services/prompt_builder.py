@@ -0,0 +1,113 @@
+import logging
+import math
+import re
+from typing import Dict, List, Optional, Union
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+# Below this many free tokens an item is dropped rather than truncated to a stub
+MIN_TRUNCATED_TOKENS = 24
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate: the larger of ~4 characters per token and one token
+    per word or punctuation mark, so dense text (URLs, numbers) errs high
+    """
+    if not text:
+        return 0
+    return max(math.ceil(len(text) / CHARS_PER_TOKEN), len(_TOKEN_PATTERN.findall(text)))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text at a word boundary so it fits in max_tokens (including the "...")
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max(0, max_tokens) * CHARS_PER_TOKEN]
+    while cut and estimate_tokens(cut + "...") > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "..."
+
+
+class _Section:
+    __slots__ = ("slot", "items", "priority", "separator", "empty", "order")
+
+    def __init__(self, slot: str, items: List[str], priority: int, separator: str, empty: str, order: int):
+        self.slot = slot
+        self.items = items
+        self.priority = priority
+        self.separator = separator
+        self.empty = empty
+        self.order = order
+
+
+class PromptBuilder:
+    """
+    Fill the slots of a prompt template within a token budget.
+
+    Sections are filled in priority order (lowest number first) and items
+    within a section in the order given, so the caller passes its best
+    evidence first. An item that does not fit is truncated if enough budget
+    is left, otherwise dropped. The template text itself is always kept.
+    """
+
+    def __init__(self, name: str, template: str, budget: Optional[int] = None):
+        self.name = name
+        self.template = template
+        self.budget = budget or settings.prompt_token_budgets.get(name, settings.prompt_default_token_budget)
+        self.tokens = 0
+        self.dropped = 0
+        self.truncated = 0
+        self._sections: List[_Section] = []
+
+    def add(
+        self,
+        slot: str,
+        items: Union[str, List[str]],
+        priority: int,
+        separator: str = "\n\n",
+        empty: str = ""
+    ) -> "PromptBuilder":
+        if isinstance(items, str):
+            items = [items]
+        items = [item for item in items if item]
+        self._sections.append(_Section(slot, items, priority, separator, empty, len(self._sections)))
+        return self
+
+    def build(self) -> str:
+        empties = {section.slot: section.empty for section in self._sections}
+        remaining = self.budget - estimate_tokens(self.template.format(**empties))
+        filled: Dict[str, str] = {}
+
+        for section in sorted(self._sections, key=lambda s: (s.priority, s.order)):
+            separator_cost = estimate_tokens(section.separator)
+            kept: List[str] = []
+            for item in section.items:
+                overhead = separator_cost if kept else 0
+                cost = estimate_tokens(item) + overhead
+                if cost <= remaining:
+                    kept.append(item)
+                    remaining -= cost
+                elif remaining - overhead >= MIN_TRUNCATED_TOKENS:
+                    item = truncate_to_tokens(item, remaining - overhead)
+                    kept.append(item)
+                    remaining -= estimate_tokens(item) + overhead
+                    self.truncated += 1
+                else:
+                    self.dropped += 1
+            filled[section.slot] = section.separator.join(kept) if kept else section.empty
+
+        prompt = self.template.format(**filled)
+        self.tokens = estimate_tokens(prompt)
+        details = f", truncated {self.truncated}, dropped {self.dropped}" if self.truncated or self.dropped else ""
+        logger.info(f"🧮 Prompt '{self.name}': ~{self.tokens}/{self.budget} tokens{details}")
+        return prompt
@@ -0,0 +1,349 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+
+# NumPy is optional: without it the semantic cache is disabled
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+STOP_WORDS = {
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    'is', 'are', 'was', 'were', 'be', 'been', 'has', 'have', 'had', 'do', 'does', 'did',
+    'this', 'that', 'it', 'its', 'says', 'say', 'said', 'reports', 'report', 'reportedly',
+    'claim', 'claims', 'true', 'really', 'news', 'breaking',
+}
+CHAR_NGRAMS = (3, 4)
+_NON_WORD = re.compile(r"[^\w\s]+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_WORD = re.compile(r"[\w']+")
+NEGATIONS = {
+    'not', 'no', 'never', 'none', 'nobody', 'nothing', 'nowhere', 'neither', 'nor', 'without',
+    'cannot', 'false', 'fake', 'denies', 'denied', 'deny',
+}
+
+
+class SemanticMatch(NamedTuple):
+    claim: str
+    value: str
+    similarity: float
+    context: str = ""
+
+
+def _facts(text: str):
+    """Numbers and negation words of a claim, which similarity alone does not weigh"""
+    text = text.lower()
+    numbers = Counter(n.replace(",", "") for n in _NUMBER.findall(text))
+    negations = Counter(
+        "not" if word.endswith("n't") else word
+        for word in _WORD.findall(text)
+        if word in NEGATIONS or word.endswith("n't")
+    )
+    return numbers, negations
+
+
+def same_facts(claim: str, other: str) -> bool:
+    """
+    True if two claims state the same numbers and negations, so "5000 people"
+    never matches "500 people" and "X did not happen" never matches "X happened"
+    """
+    return _facts(claim) == _facts(other)
+
+
+class SemanticCache:
+    """
+    Paraphrase-tolerant lookup of previously analyzed claims, fully local.
+
+    Each claim becomes a hashed TF-IDF vector over its content words and
+    character 3/4-grams, L2-normalized and stored as a row of a float32
+    matrix, so a lookup is one matrix-vector product plus a top-k partition.
+    IDF weights are taken from the claims seen so far at insert time.
+    Entries expire after `ttl_seconds`; when full, the least recently used
+    entry is evicted. The index can be saved to and loaded from an .npz file.
+
+    Each entry carries a `context` string (e.g. response language and linked
+    URLs) so callers can require it to match before reusing a value. lookup()
+    and add() are thread-safe, so they can run in a worker thread.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        max_entries: int,
+        ttl_seconds: float,
+        path: Optional[str] = None,
+        autosave_every: int = 50,
+        enabled: bool = True
+    ):
+        self.enabled = enabled and np is not None
+        self.dim = dim
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.autosave_every = autosave_every
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._dirty = 0
+        self.claims: List[str] = []
+        self.values: List[str] = []
+        self.contexts: List[str] = []
+        self._lock = threading.Lock()
+        # normalized claim -> row, so re-analyzing the same claim replaces its entry
+        self._rows: Dict[str, int] = {}
+
+        if enabled and np is None:
+            logger.warning("⚠️ NumPy not installed. Semantic cache will be disabled.")
+        if not self.enabled:
+            return
+
+        self._matrix = np.zeros((min(max_entries, 1024), dim), dtype=np.float32)
+        self._last_used = np.zeros(len(self._matrix), dtype=np.float64)
+        self._created = np.zeros(len(self._matrix), dtype=np.float64)
+        self._df = np.zeros(dim, dtype=np.float64)
+        self._documents = 0
+
+        if path and os.path.exists(path):
+            try:
+                self._load(path)
+                logger.info(f"✅ Semantic cache loaded {self.size} claims from {path}")
+            except Exception as e:
+                logger.error(f"❌ Failed to load semantic cache from {path}: {e}")
+
+    # ------------------------ Vectorizing ------------------------
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(w for w in _NON_WORD.sub(" ", text.lower()).split() if w not in STOP_WORDS)
+
+    def _buckets(self, text: str):
+        """Hashed feature buckets and signs for the claim's words and character n-grams"""
+        words = self._normalize(text).split()
+        features = [f"w:{w}" for w in words]
+        joined = f" {' '.join(words)} "
+        for n in CHAR_NGRAMS:
+            features.extend(joined[i:i + n] for i in range(len(joined) - n + 1))
+        # crc32 is stable across processes (unlike hash()), so persisted vectors stay valid
+        hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+        buckets = (hashes % self.dim).astype(np.intp)
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        return buckets, signs
+
+    def _vectorize(self, buckets, signs):
+        tf = np.bincount(buckets, weights=signs, minlength=self.dim)
+        idf = np.log((self._documents + 1) / (self._df + 1)) + 1.0
+        vector = (np.sign(tf) * np.log1p(np.abs(tf)) * idf).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    # ------------------------ Lookup / insert ------------------------
+
+    def lookup(self, claim: str, k: int = 3, min_similarity: float = 0.0) -> List[SemanticMatch]:
+        """
+        Up to k cached claims most similar to `claim`, best first
+        """
+        if not self.enabled or not claim:
+            return []
+        with self._lock:
+            return self._lookup(claim, k, min_similarity)
+
+    def _lookup(self, claim: str, k: int, min_similarity: float) -> List[SemanticMatch]:
+        if self.size == 0:
+            return []
+        query = self._vectorize(*self._buckets(claim))
+        scores = self._matrix[:self.size] @ query
+        if self.size > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(self.size)
+        top = top[np.argsort(-scores[top])]
+
+        now = time.time()
+        matches = []
+        expired = []
+        for row in top:
+            similarity = float(scores[row])
+            if similarity < min_similarity:
+                break
+            if now - self._created[row] > self.ttl_seconds:
+                expired.append(int(row))
+                continue
+            self._last_used[row] = now
+            matches.append(SemanticMatch(self.claims[row], self.values[row], similarity, self.contexts[row]))
+        # Remove from the highest row down so swaps don't move other expired rows
+        for row in sorted(expired, reverse=True):
+            self._remove(row)
+            self.expirations += 1
+
+        if matches:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return matches
+
+    def add(self, claim: str, value: str, context: str = ""):
+        """
+        Index a claim with its cached value (replaces the same normalized claim)
+        """
+        if not self.enabled or not claim:
+            return
+        with self._lock:
+            self._add(claim, value, context)
+
+    def _add(self, claim: str, value: str, context: str):
+        buckets, signs = self._buckets(claim)
+        self._documents += 1
+        self._df[np.unique(buckets)] += 1
+        vector = self._vectorize(buckets, signs)
+
+        key = self._normalize(claim)
+        row = self._rows.get(key)
+        if row is None:
+            if self.size >= self.max_entries:
+                self._remove(int(np.argmin(self._last_used[:self.size])))
+                self.evictions += 1
+            self._grow()
+            row = self.size
+            self.size += 1
+            self.claims.append(claim)
+            self.values.append(value)
+            self.contexts.append(context)
+            self._rows[key] = row
+        else:
+            self.claims[row] = claim
+            self.values[row] = value
+            self.contexts[row] = context
+
+        now = time.time()
+        self._matrix[row] = vector
+        self._last_used[row] = now
+        self._created[row] = now
+        self._dirty += 1
+
+    def _grow(self):
+        if self.size < len(self._matrix):
+            return
+        capacity = min(self.max_entries, max(1024, len(self._matrix) * 2))
+        for name in ("_matrix", "_last_used", "_created"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _remove(self, row: int):
+        """Drop a row by moving the last row into its place"""
+        last = self.size - 1
+        self._rows.pop(self._normalize(self.claims[row]), None)
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._last_used[row] = self._last_used[last]
+            self._created[row] = self._created[last]
+            self.claims[row] = self.claims[last]
+            self.values[row] = self.values[last]
+            self.contexts[row] = self.contexts[last]
+            self._rows[self._normalize(self.claims[row])] = row
+        self.claims.pop()
+        self.values.pop()
+        self.contexts.pop()
+        self.size = last
+
+    def __len__(self) -> int:
+        return self.size
+
+    # ------------------------ Persistence ------------------------
+
+    async def save(self, force: bool = False):
+        """
+        Write the index to `path` atomically in a worker thread, once
+        `autosave_every` claims have changed (or on any change with force)
+        """
+        if not self.enabled or not self.path or not self._dirty:
+            return
+        if not force and self._dirty < self.autosave_every:
+            return
+        try:
+            snapshot = await asyncio.to_thread(self._snapshot)
+            await asyncio.to_thread(self._write, self.path, snapshot)
+            logger.info(f"💾 Semantic cache saved {len(snapshot['claims'])} claims to {self.path}")
+        except Exception as e:
+            logger.error(f"❌ Failed to save semantic cache to {self.path}: {e}")
+
+    def _snapshot(self) -> Dict:
+        with self._lock:
+            self._dirty = 0
+            return {
+                "matrix": self._matrix[:self.size].copy(),
+                "last_used": self._last_used[:self.size].copy(),
+                "created": self._created[:self.size].copy(),
+                "df": self._df.copy(),
+                "documents": np.array([self._documents]),
+                "claims": np.array(self.claims, dtype=str),
+                "values": np.array(self.values, dtype=str),
+                "contexts": np.array(self.contexts, dtype=str),
+            }
+
+    @staticmethod
+    def _write(path: str, snapshot: Dict):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **snapshot)
+        os.replace(tmp_path, path)
+
+    def _load(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            matrix = data["matrix"]
+            if matrix.shape[1] != self.dim:
+                raise ValueError(f"index dimension {matrix.shape[1]} does not match configured {self.dim}")
+            keep = slice(max(0, len(matrix) - self.max_entries), len(matrix))
+            self.size = len(matrix[keep])
+            self._matrix = np.zeros((max(self.size, len(self._matrix)), self.dim), dtype=np.float32)
+            self._matrix[:self.size] = matrix[keep]
+            self._last_used = np.zeros(len(self._matrix), dtype=np.float64)
+            self._last_used[:self.size] = data["last_used"][keep]
+            self._created = np.zeros(len(self._matrix), dtype=np.float64)
+            self._created[:self.size] = data["created"][keep]
+            self._df = data["df"].astype(np.float64)
+            self._documents = int(data["documents"][0])
+            self.claims = [str(c) for c in data["claims"][keep]]
+            self.values = [str(v) for v in data["values"][keep]]
+            # Indexes saved before contexts existed only seed, never reuse
+            if "contexts" in data:
+                self.contexts = [str(c) for c in data["contexts"][keep]]
+            else:
+                self.contexts = [""] * self.size
+            self._rows = {self._normalize(claim): row for row, claim in enumerate(self.claims)}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "enabled": self.enabled,
+            "entries": self.size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# Shared index of analyzed claims used by the news analyzer
+semantic_cache = SemanticCache(
+    dim=settings.semantic_cache_dim,
+    max_entries=settings.semantic_cache_max_entries,
+    ttl_seconds=settings.semantic_cache_ttl_seconds,
+    path=settings.semantic_cache_path,
+    autosave_every=settings.semantic_cache_autosave_every,
+    enabled=settings.semantic_cache_enabled,
+)
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Every store created through create_session_store, swept by the background task
+_STORES: List["SessionStore"] = []
+_sweeper_task: Optional[asyncio.Task] = None
+
+
+class SessionStore(ABC):
+    """
+    Key/value store for per-session state with an entry cap (LRU eviction)
+    and an idle TTL. Values must be JSON-serializable. Methods are coroutines
+    so backends can do their I/O off the event loop.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self.expirations = 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any):
+        ...
+
+    @abstractmethod
+    async def append(self, key: str, item: Any) -> List[Any]:
+        """Atomically append to the list stored at key (created if missing); returns the new list."""
+
+    @abstractmethod
+    async def update(self, key: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Atomically merge changes into the dict stored at key (created if missing); returns it."""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def sweep(self) -> int:
+        """Drop expired entries; returns how many were removed."""
+
+    @abstractmethod
+    async def count(self) -> int:
+        ...
+
+    @abstractmethod
+    async def memory_bytes(self) -> int:
+        ...
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.__class__.__name__,
+            "entries": await self.count(),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "approx_bytes": await self.memory_bytes(),
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store; each uvicorn worker has its own copy. Nothing here
+    awaits, so every operation is atomic on the event loop.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float):
+        super().__init__(name, max_entries, ttl_seconds)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, last_active = entry
+        if time.monotonic() - last_active > self.ttl_seconds:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: Any):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._get(key)
+
+    async def set(self, key: str, value: Any):
+        self._set(key, value)
+
+    async def append(self, key: str, item: Any) -> List[Any]:
+        value = (self._get(key) or []) + [item]
+        self._set(key, value)
+        return value
+
+    async def update(self, key: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        value = {**(self._get(key) or {}), **changes}
+        self._set(key, value)
+        return value
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def sweep(self) -> int:
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [key for key, (_, last_active) in self._entries.items() if last_active < cutoff]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+        return len(expired)
+
+    async def count(self) -> int:
+        return len(self._entries)
+
+    async def memory_bytes(self) -> int:
+        # Approximation: serialized size of keys and values
+        return sum(len(key) + len(json.dumps(value, default=str)) for key, (value, _) in self._entries.items())
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite-backed store so every worker on a host sees the same sessions.
+    Queries run in a worker thread. append()/update() read and write in one
+    BEGIN IMMEDIATE transaction, so concurrent writers (in any worker) never
+    lose each other's changes. The entry cap is enforced every
+    `evict_every` writes and on each sweep, so it can be briefly exceeded.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float, path: str, evict_every: int = 64):
+        super().__init__(name, max_entries, ttl_seconds)
+        self.path = path
+        self.evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "store TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, last_active REAL NOT NULL, "
+            "PRIMARY KEY (store, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_active ON sessions (store, last_active)")
+
+    def _read(self, key: str) -> Optional[Any]:
+        row = self._conn.execute(
+            "SELECT value, last_active FROM sessions WHERE store = ? AND key = ?", (self.name, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value, last_active = row
+        if time.time() - last_active > self.ttl_seconds:
+            self._conn.execute("DELETE FROM sessions WHERE store = ? AND key = ?", (self.name, key))
+            self.expirations += 1
+            return None
+        return json.loads(value)
+
+    def _write(self, key: str, value: Any):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions (store, key, value, last_active) VALUES (?, ?, ?, ?)",
+            (self.name, key, json.dumps(value, default=str), time.time()),
+        )
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self._evict()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM sessions WHERE store = ?", (self.name,)).fetchone()[0]
+        if count > self.max_entries:
+            cursor = self._conn.execute(
+                "DELETE FROM sessions WHERE store = ? AND key IN ("
+                "SELECT key FROM sessions WHERE store = ? ORDER BY last_active ASC LIMIT ?)",
+                (self.name, self.name, count - self.max_entries),
+            )
+            self.evictions += cursor.rowcount
+
+    def _transaction(self, func, *args, immediate: bool = True):
+        """
+        Run func(*args) in one transaction; an immediate one holds the
+        database write lock from the start, so a read-modify-write is atomic
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                result = func(*args)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _append(self, key: str, item: Any) -> List[Any]:
+        value = (self._read(key) or []) + [item]
+        self._write(key, value)
+        return value
+
+    def _update(self, key: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        value = {**(self._read(key) or {}), **changes}
+        self._write(key, value)
+        return value
+
+    def _sweep(self) -> int:
+        cursor = self._conn.execute(
+            "DELETE FROM sessions WHERE store = ? AND last_active < ?",
+            (self.name, time.time() - self.ttl_seconds),
+        )
+        self.expirations += cursor.rowcount
+        self._evict()
+        return cursor.rowcount
+
+    def _query(self, sql: str) -> Any:
+        with self._lock:
+            return self._conn.execute(sql, (self.name,)).fetchone()[0]
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self._transaction, self._read, key, immediate=False)
+
+    async def set(self, key: str, value: Any):
+        await asyncio.to_thread(self._transaction, self._write, key, value)
+
+    async def append(self, key: str, item: Any) -> List[Any]:
+        return await asyncio.to_thread(self._transaction, self._append, key, item)
+
+    async def update(self, key: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._transaction, self._update, key, changes)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(
+            self._transaction, self._conn.execute,
+            "DELETE FROM sessions WHERE store = ? AND key = ?", (self.name, key)
+        )
+
+    async def sweep(self) -> int:
+        return await asyncio.to_thread(self._transaction, self._sweep)
+
+    async def count(self) -> int:
+        return await asyncio.to_thread(self._query, "SELECT COUNT(*) FROM sessions WHERE store = ?")
+
+    async def memory_bytes(self) -> int:
+        return await asyncio.to_thread(
+            self._query, "SELECT COALESCE(SUM(LENGTH(key) + LENGTH(value)), 0) FROM sessions WHERE store = ?"
+        )
+
+
+def create_session_store(name: str, ttl_seconds: float, max_entries: Optional[int] = None) -> SessionStore:
+    """
+    Build a store on the configured backend and register it with the sweeper
+    """
+    max_entries = max_entries or settings.session_max_entries
+    store: SessionStore
+    if settings.session_backend == "sqlite":
+        try:
+            store = SQLiteSessionStore(name, max_entries, ttl_seconds, settings.session_sqlite_path)
+            logger.info(f"✅ Session store '{name}' using SQLite at {settings.session_sqlite_path}")
+        except Exception as e:
+            logger.error(f"❌ Failed to open session database, falling back to memory: {e}")
+            store = MemorySessionStore(name, max_entries, ttl_seconds)
+    else:
+        store = MemorySessionStore(name, max_entries, ttl_seconds)
+    _STORES.append(store)
+    return store
+
+
+async def session_stats() -> Dict[str, Any]:
+    return {store.name: await store.stats() for store in _STORES}
+
+
+async def _sweep_forever(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        for store in _STORES:
+            try:
+                removed = await store.sweep()
+                if removed:
+                    logger.info(f"🧹 Session store '{store.name}': expired {removed} entries")
+            except Exception as e:
+                logger.error(f"❌ Session sweep failed for '{store.name}': {e}")
+
+
+def start_session_sweeper():
+    """
+    Start the periodic TTL sweeper (called on app startup)
+    """
+    global _sweeper_task
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.create_task(_sweep_forever(settings.session_sweep_interval_seconds))
+
+
+async def stop_session_sweeper():
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+        _sweeper_task = None
@@ -1,23 +1,65 @@
 import logging
 import os
 import asyncio
-from typing import List, Optional
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 
+import httpx
 import tweepy
 from dotenv import load_dotenv
 
 from app.models.response_models import TwitterTweet
 from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.metrics import record_cache, track
+from app.core.tracing import span
+from app.utils.singleflight import SingleFlight
+from app.utils.rate_limit import TokenBucket
+from app.utils.swr_cache import StaleWhileRevalidateCache
+from app.utils.batching import MicroBatcher
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+TWEET_FIELDS = "created_at,author_id,public_metrics"
+# GET /2/tweets accepts at most this many ids per request
+MAX_IDS_PER_LOOKUP = 100
+# The route search_budget mirrors; other routes have their own server-side limits
+SEARCH_ROUTE = "/2/tweets/search/recent"
+
 
 class TwitterService:
     def __init__(self):
         self.client = None
         self.is_available = False
+        # App-only bearer token enables the native async path (pooled httpx,
+        # no thread hop); otherwise tweepy runs in a worker thread
+        self.bearer_token = settings.twitter_bearer_token
+        self.api_base_url = settings.twitter_api_base_url.rstrip("/")
+        self._semaphore = asyncio.Semaphore(max(1, settings.twitter_max_concurrency))
+        # Concurrent identical searches share one upstream request
+        self._search_flight = SingleFlight("twitter_search")
+        # Client-side view of the recent-search rate limit window
+        self.search_budget = TokenBucket(
+            settings.twitter_search_requests_per_window,
+            settings.twitter_search_window_seconds
+        )
+        # Last good results per query, served stale while a refresh runs
+        self._search_cache = StaleWhileRevalidateCache(
+            settings.twitter_cache_max_entries,
+            settings.twitter_cache_fresh_seconds,
+            settings.twitter_cache_stale_seconds
+        )
+        self._refresh_tasks = set()
+        # Concurrent single-tweet lookups are merged into bulk GET /2/tweets?ids= calls
+        self._lookup_batcher = MicroBatcher(
+            self._lookup_batch,
+            max_batch_size=MAX_IDS_PER_LOOKUP,
+            max_delay=settings.twitter_lookup_batch_window_ms / 1000,
+            name="tweet_lookup"
+        )
+        self.rate_limited = 0
+        self.budget_rejections = 0
         
         try:
             # Check if we have the required API keys
@@ -27,6 +69,10 @@ class TwitterService:
                 settings.twitter_access_token,
                 settings.twitter_access_token_secret
             ]):
+                if self.bearer_token:
+                    self.is_available = True
+                    logger.info("✅ Twitter async client initialized (bearer token)")
+                    return
                 logger.warning("⚠️ Twitter API keys not configured. Twitter service will be disabled.")
                 return
                 
@@ -35,7 +81,9 @@ class TwitterService:
                 consumer_secret=settings.twitter_api_secret,
                 access_token=settings.twitter_access_token,
                 access_token_secret=settings.twitter_access_token_secret,
-                wait_on_rate_limit=True
+                # Never sleep a worker thread for a rate-limit window; the
+                # token bucket and stale cache handle running out of budget
+                wait_on_rate_limit=False
             )
             self.is_available = True
             logger.info("✅ Twitter client initialized successfully")
@@ -49,27 +97,227 @@ class TwitterService:
             logger.warning("⚠️ Twitter service not available. Returning empty results.")
             return []
             
-        return await asyncio.to_thread(self._search_tweets_sync, keyword, max_results)
+        key = f"{self._clean_search_query(keyword).lower()}|{max_results}"
+        cached, state = self._search_cache.get(key)
+        if state == StaleWhileRevalidateCache.FRESH:
+            record_cache("twitter_search", "hit")
+            return list(cached)
+        if state == StaleWhileRevalidateCache.STALE:
+            record_cache("twitter_search", "stale")
+            # Serve the last good result now; refresh in the background if budget allows
+            self._schedule_refresh(key, keyword, max_results)
+            return list(cached)
 
-    def _search_tweets_sync(self, keyword: str, max_results: int) -> List[TwitterTweet]:
-        if not self.client:
+        if not self._search_flight.is_in_flight(key) and not self.search_budget.try_acquire():
+            self.budget_rejections += 1
+            logger.warning(
+                f"🚫 Twitter search budget exhausted; retry in {self.search_budget.seconds_until_available():.0f}s"
+            )
             return []
+        record_cache("twitter_search", "miss")
+        with track("twitter", "search") as call:
+            tweets = await self._search_flight.do(key, self._fetch_and_cache, key, keyword, max_results)
+            if tweets is None:
+                call.fail()
+        return list(tweets or [])
+
+    async def iter_search_tweets(
+        self,
+        keyword: str,
+        max_total: Optional[int] = None,
+        page_size: int = 100,
+        stop_when: Optional[Callable[[List[TwitterTweet]], bool]] = None
+    ) -> AsyncIterator[List[TwitterTweet]]:
+        """
+        Search recent tweets page by page, following next_token, and yield
+        each page as soon as it arrives. Stops after `max_total` tweets
+        (default: settings.max_tweets_per_request), when `stop_when` returns
+        True for the tweets collected so far, when results run out, or when
+        the search budget is spent.
+        """
+        if not self.is_available:
+            logger.warning("⚠️ Twitter service not available. Returning empty results.")
+            return
+
+        query = self._clean_search_query(keyword)
+        remaining = max_total or settings.max_tweets_per_request
+        collected: List[TwitterTweet] = []
+        next_token = None
+        logger.info(f"🔍 Paging tweets: {query} (up to {remaining})")
+
+        while remaining > 0:
+            if not self.search_budget.try_acquire():
+                self.budget_rejections += 1
+                logger.warning("🚫 Twitter search budget exhausted; stopping pagination")
+                return
+            size = min(page_size, remaining)
+            if self.bearer_token:
+                page = await self._search_page_async(query, size, next_token)
+            else:
+                page = await asyncio.to_thread(self._search_page_sync, query, size, next_token)
+            if page is None:
+                return
+
+            tweets, next_token = page
+            tweets = tweets[:remaining]
+            if tweets:
+                remaining -= len(tweets)
+                yield tweets
+            if stop_when is not None:
+                collected.extend(tweets)
+                if stop_when(collected):
+                    return
+            if not next_token:
+                return
+
+    async def _fetch_and_cache(self, key: str, keyword: str, max_results: int) -> Optional[List[TwitterTweet]]:
+        if self.bearer_token:
+            tweets = await self._search_tweets_async(keyword, max_results)
+        else:
+            tweets = await asyncio.to_thread(self._search_tweets_sync, keyword, max_results)
+        if tweets is not None:
+            self._search_cache.set(key, tweets)
+        return tweets
+
+    def _schedule_refresh(self, key: str, keyword: str, max_results: int):
+        if self._search_flight.is_in_flight(key) or not self.search_budget.try_acquire():
+            return
+        task = asyncio.create_task(self._search_flight.do(key, self._fetch_and_cache, key, keyword, max_results))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    def get_stats(self) -> dict:
+        """Remaining search budget and cache counters."""
+        return {
+            "available": self.is_available,
+            "transport": "async" if self.bearer_token else "thread",
+            "search_budget_remaining": int(self.search_budget.remaining),
+            "search_budget_capacity": int(self.search_budget.capacity),
+            "search_budget_reset_in_seconds": round(self.search_budget.seconds_until_available(self.search_budget.capacity), 1),
+            "rate_limited": self.rate_limited,
+            "budget_rejections": self.budget_rejections,
+            "cache": self._search_cache.stats(),
+            "coalescing": self._search_flight.stats(),
+            "lookup_batching": self._lookup_batcher.stats(),
+        }
+
+    async def _api_get(self, route: str, params: dict) -> Optional[dict]:
+        """
+        GET an X API v2 route on the shared pooled client. Returns the JSON
+        body, or None on failure (errors are logged, never raised).
+        """
+        async with self._semaphore:
+            try:
+                with span("http.twitter", route=route):
+                    response = await get_http_client().get(
+                        f"{self.api_base_url}{route}",
+                        params=params,
+                        headers={"Authorization": f"Bearer {self.bearer_token}"}
+                    )
+            except httpx.HTTPError as e:
+                logger.error(f"❌ Twitter request error: {e}")
+                return None
+
+        if response.status_code == 429:
+            logger.error(f"🚫 Twitter rate limit hit on {route}")
+            self.rate_limited += 1
+            if route == SEARCH_ROUTE:
+                reset = response.headers.get("x-rate-limit-reset")
+                self.search_budget.exhaust(float(reset) if reset else None)
+            return None
+        if response.status_code == 401:
+            logger.error("🔐 Twitter API unauthorized")
+            return None
+        if response.status_code >= 400:
+            logger.error(f"❌ Twitter API error {response.status_code}: {response.text[:200]}")
+            return None
+        return response.json()
+
+    async def _search_tweets_async(self, keyword: str, max_results: int) -> Optional[List[TwitterTweet]]:
+        query = self._clean_search_query(keyword)
+        logger.info(f"🔍 Searching tweets: {query}")
+
+        page = await self._search_page_async(query, max_results)
+        if page is None:
+            return None
+
+        tweet_list = page[0][:max_results]
+        logger.info(f"✅ Found {len(tweet_list)} tweets")
+        return tweet_list
+
+    async def _search_page_async(
+        self, query: str, page_size: int, next_token: Optional[str] = None
+    ) -> Optional[Tuple[List[TwitterTweet], Optional[str]]]:
+        params = {
+            "query": query,
+            # The API accepts 10-100 per page
+            "max_results": max(10, min(page_size, 100)),
+            "tweet.fields": TWEET_FIELDS,
+            "expansions": "author_id",
+            "user.fields": "username,verified",
+        }
+        if next_token:
+            params["next_token"] = next_token
+        body = await self._api_get(SEARCH_ROUTE, params)
+        if body is None:
+            return None
+        return self._tweets_from_json(body), body.get("meta", {}).get("next_token")
+
+    def _tweets_from_json(self, body: dict) -> List[TwitterTweet]:
+        users = {u["id"]: u for u in body.get("includes", {}).get("users", [])}
+        tweet_list = []
+        for tweet in body.get("data") or []:
+            user = users.get(tweet.get("author_id"))
+            tweet_list.append(TwitterTweet(
+                id=str(tweet["id"]),
+                text=tweet.get("text", ""),
+                author_username=user["username"] if user else "unknown",
+                author_id=str(tweet.get("author_id", "")),
+                created_at=tweet.get("created_at"),
+                public_metrics=tweet.get("public_metrics") or {},
+                url=f"https://twitter.com/{user['username']}/status/{tweet['id']}" if user else "unknown"
+            ))
+        return tweet_list
+
+    def _search_tweets_sync(self, keyword: str, max_results: int) -> Optional[List[TwitterTweet]]:
+        """Blocking search; returns None on failure so errors are never cached."""
+        if not self.client:
+            return None
             
-        try:
-            query = self._clean_search_query(keyword)
-            logger.info(f"🔍 Searching tweets: {query}")
+        query = self._clean_search_query(keyword)
+        logger.info(f"🔍 Searching tweets: {query}")
+
+        page = self._search_page_sync(query, max_results)
+        if page is None:
+            return None
+
+        tweet_list = page[0][:max_results]
+        if not tweet_list:
+            logger.info("⚠️ No tweets found.")
+        else:
+            logger.info(f"✅ Found {len(tweet_list)} tweets")
+        return tweet_list
+
+    def _search_page_sync(
+        self, query: str, page_size: int, next_token: Optional[str] = None
+    ) -> Optional[Tuple[List[TwitterTweet], Optional[str]]]:
+        if not self.client:
+            return None
 
+        try:
             tweets = self.client.search_recent_tweets(
                 query=query,
-                max_results=min(max_results, 100),
+                # The API accepts 10-100 per page
+                max_results=max(10, min(page_size, 100)),
+                next_token=next_token,
                 tweet_fields=["created_at", "author_id", "public_metrics"],
                 expansions=["author_id"],
                 user_fields=["username", "verified"]
             )
 
+            next_token = (tweets.meta or {}).get("next_token")
             if not tweets.data:
-                logger.info("⚠️ No tweets found.")
-                return []
+                return [], next_token
 
             users = {u.id: u for u in tweets.includes.get("users", [])}
             tweet_list = []
@@ -86,54 +334,90 @@ class TwitterService:
                     url=f"https://twitter.com/{user.username}/status/{tweet.id}" if user else "unknown"
                 ))
 
-            logger.info(f"✅ Found {len(tweet_list)} tweets")
-            return tweet_list
+            return tweet_list, next_token
 
-        except tweepy.TooManyRequests:
+        except tweepy.TooManyRequests as e:
             logger.error("🚫 Twitter rate limit hit")
-            return []
+            self.rate_limited += 1
+            reset = e.response.headers.get("x-rate-limit-reset") if e.response is not None else None
+            self.search_budget.exhaust(float(reset) if reset else None)
+            return None
         except tweepy.Unauthorized:
             logger.error("🔐 Twitter API unauthorized")
-            return []
+            return None
         except Exception as e:
             logger.error(f"❌ Twitter search error: {e}")
-            return []
+            return None
 
     async def get_tweet_by_id(self, tweet_id: str) -> Optional[TwitterTweet]:
-        """Get a tweet by ID."""
+        """Get a tweet by ID (batched with other lookups arriving at the same time)."""
         if not self.is_available:
             return None
             
-        return await asyncio.to_thread(self._get_tweet_by_id_sync, tweet_id)
+        try:
+            return await self._lookup_batcher.submit(str(tweet_id))
+        except Exception as e:
+            logger.error(f"❌ Failed to fetch tweet {tweet_id}: {e}")
+            return None
+
+    async def get_tweets_by_ids(self, tweet_ids: List[str]) -> List[TwitterTweet]:
+        """Get many tweets by ID, up to 100 per API request. Missing tweets are skipped."""
+        if not self.is_available or not tweet_ids:
+            return []
+
+        ids = list(dict.fromkeys(str(tweet_id) for tweet_id in tweet_ids))
+        found = await self._lookup_batch(ids)
+        return [found[tweet_id] for tweet_id in ids if tweet_id in found]
+
+    async def _lookup_batch(self, tweet_ids: List[str]) -> Dict[str, TwitterTweet]:
+        chunks = [tweet_ids[i:i + MAX_IDS_PER_LOOKUP] for i in range(0, len(tweet_ids), MAX_IDS_PER_LOOKUP)]
+        if self.bearer_token:
+            results = await asyncio.gather(*(self._get_tweets_async(chunk) for chunk in chunks))
+        else:
+            results = await asyncio.gather(*(asyncio.to_thread(self._get_tweets_sync, chunk) for chunk in chunks))
+        return {tweet.id: tweet for tweets in results for tweet in tweets}
 
-    def _get_tweet_by_id_sync(self, tweet_id: str) -> Optional[TwitterTweet]:
+    async def _get_tweets_async(self, tweet_ids: List[str]) -> List[TwitterTweet]:
+        body = await self._api_get("/2/tweets", {
+            "ids": ",".join(tweet_ids),
+            "tweet.fields": TWEET_FIELDS,
+            "expansions": "author_id",
+            "user.fields": "username",
+        })
+        return self._tweets_from_json(body) if body else []
+
+    def _get_tweets_sync(self, tweet_ids: List[str]) -> List[TwitterTweet]:
         if not self.client:
-            return None
+            return []
             
         try:
-            response = self.client.get_tweet(
-                tweet_id,
+            response = self.client.get_tweets(
+                tweet_ids,
                 tweet_fields=["created_at", "author_id", "public_metrics"],
                 expansions=["author_id"],
                 user_fields=["username"]
             )
 
             if not response.data:
-                return None
+                return []
 
-            user = response.includes.get("users", [None])[0]
-            return TwitterTweet(
-                id=str(response.data.id),
-                text=response.data.text,
-                author_username=user.username if user else "unknown",
-                author_id=str(response.data.author_id),
-                created_at=response.data.created_at,
-                public_metrics=response.data.public_metrics or {},
-                url=f"https://twitter.com/{user.username}/status/{response.data.id}" if user else "unknown"
-            )
+            users = {u.id: u for u in response.includes.get("users", [])}
+            tweet_list = []
+            for tweet in response.data:
+                user = users.get(tweet.author_id)
+                tweet_list.append(TwitterTweet(
+                    id=str(tweet.id),
+                    text=tweet.text,
+                    author_username=user.username if user else "unknown",
+                    author_id=str(tweet.author_id),
+                    created_at=tweet.created_at,
+                    public_metrics=tweet.public_metrics or {},
+                    url=f"https://twitter.com/{user.username}/status/{tweet.id}" if user else "unknown"
+                ))
+            return tweet_list
         except Exception as e:
-            logger.error(f"❌ Failed to fetch tweet {tweet_id}: {e}")
-            return None
+            logger.error(f"❌ Failed to fetch tweets {', '.join(tweet_ids[:5])}: {e}")
+            return []
 
     def _clean_search_query(self, keyword: str) -> str:
         keyword = keyword.strip()
@@ -0,0 +1,107 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+
+class ArticleCacheEntry:
+    __slots__ = ("text", "etag", "last_modified", "fetched_at", "size")
+
+    def __init__(self, text: str, etag: Optional[str], last_modified: Optional[str]):
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.time()
+        self.size = len(text.encode("utf-8"))
+
+    def validator_headers(self) -> Dict[str, str]:
+        """Headers for a conditional GET against the origin"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ArticleCache:
+    """
+    Extracted article text per URL with the origin's ETag/Last-Modified.
+
+    Within its TTL an entry is served without any request. After that it is
+    kept for revalidation: a conditional GET that returns 304 re-arms the
+    entry without downloading or re-parsing the page. Total size is bounded
+    by `max_bytes` with LRU eviction. `domain_ttls` overrides the TTL for a
+    domain and its subdomains (e.g. {"reuters.com": 60}).
+    """
+
+    def __init__(self, max_bytes: int, default_ttl: float, domain_ttls: Optional[Dict[str, float]] = None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.domain_ttls = {domain.lower().lstrip("."): ttl for domain, ttl in (domain_ttls or {}).items()}
+        self._entries: "OrderedDict[str, ArticleCacheEntry]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, url: str) -> float:
+        host = (urlparse(url).hostname or "").lower()
+        while host:
+            if host in self.domain_ttls:
+                return self.domain_ttls[host]
+            host = host.partition(".")[2]
+        return self.default_ttl
+
+    def get(self, url: str) -> Optional[ArticleCacheEntry]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def get_fresh(self, url: str) -> Optional[str]:
+        """Cached text if the entry is still within its TTL"""
+        entry = self.get(url)
+        if entry is not None and time.time() - entry.fetched_at <= self.ttl_for(url):
+            self.hits += 1
+            return entry.text
+        return None
+
+    def mark_revalidated(self, url: str) -> Optional[str]:
+        """Origin answered 304: restart the entry's TTL and return its text"""
+        entry = self.get(url)
+        if entry is None:
+            return None
+        entry.fetched_at = time.time()
+        self.revalidated += 1
+        return entry.text
+
+    def set(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.misses += 1
+        entry = ArticleCacheEntry(text, etag, last_modified)
+        if entry.size > self.max_bytes:
+            return
+        old = self._entries.pop(url, None)
+        if old is not None:
+            self.total_bytes -= old.size
+        self._entries[url] = entry
+        self.total_bytes += entry.size
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
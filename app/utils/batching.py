@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Merge single-item lookups that arrive within a short window into one bulk call.
+
+    `batch_func` receives a list of unique keys and returns a dict of
+    key -> result; keys missing from the dict resolve to None. Each caller
+    awaits only its own key. A batch is flushed when `max_batch_size` keys
+    are pending or `max_delay` seconds after the first key arrived.
+    """
+
+    def __init__(
+        self,
+        batch_func: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        max_batch_size: int = 100,
+        max_delay: float = 0.005,
+        name: str = "batcher",
+    ):
+        self.batch_func = batch_func
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.name = name
+        self._pending: Dict[Hashable, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, key: Hashable) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+        self.items += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush_now)
+        return await future
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: Dict[Hashable, List[asyncio.Future]]):
+        # Skip keys whose callers have all gone away
+        keys = [key for key, futures in batch.items() if any(not f.done() for f in futures)]
+        if not keys:
+            return
+        self.batches += 1
+        try:
+            results = await self.batch_func(keys)
+        except Exception as e:
+            logger.error(f"❌ {self.name}: batch of {len(keys)} failed: {e}")
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for key, futures in batch.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(results.get(key))
+
+    def stats(self) -> Dict[str, int]:
+        return {"batches": self.batches, "items": self.items, "pending": len(self._pending)}
@@ -1,60 +1,99 @@
 import re
 import httpx
-from typing import Optional, List
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional, List, Tuple
 import logging
-from bs4 import BeautifulSoup
 import asyncio
+import itertools
 from urllib.parse import urlparse
 
+from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.metrics import record_cache, track
+from app.utils.article_cache import ArticleCache
+
+# Fastest available HTML parser: selectolax, then lxml, then BeautifulSoup's html.parser
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
+try:
+    import lxml.html as lxml_html
+except ImportError:
+    lxml_html = None
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
 logger = logging.getLogger(__name__)
 
+# Extract text from common news article elements, in order of preference
+CONTENT_SELECTORS = [
+    'article',
+    '.article-content',
+    '.post-content',
+    '.entry-content',
+    '.content',
+    'main',
+    '.main-content'
+]
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+STRIP_TAGS = ["script", "style", "noscript"]
+HIDDEN_MARKUP = re.compile(rb"<(script|style|noscript)\b.*?</\1\s*>|<[^>]*>", re.S | re.I)
+
+article_cache = ArticleCache(
+    max_bytes=settings.article_cache_max_bytes,
+    default_ttl=settings.article_cache_ttl_seconds,
+    domain_ttls=settings.article_cache_domain_ttls,
+)
+
 async def extract_text_from_url(url: str) -> Optional[str]:
     """
-    Extract text content from a URL
+    Extract text content from a URL.
+    The body is streamed with a hard byte cap and parsing runs off the event loop.
+    Results are cached per URL and revalidated with ETag/Last-Modified.
     """
+    cached = article_cache.get_fresh(url)
+    if cached is not None:
+        record_cache("article", "hit")
+        return cached
+
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, follow_redirects=True)
-            response.raise_for_status()
-            
-            # Parse HTML content
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Extract text from common news article elements
-            content_selectors = [
-                'article',
-                '.article-content',
-                '.post-content',
-                '.entry-content',
-                '.content',
-                'main',
-                '.main-content'
-            ]
-            
-            content = ""
-            for selector in content_selectors:
-                elements = soup.select(selector)
-                if elements:
-                    content = elements[0].get_text()
-                    break
-            
-            # Fallback to body if no specific content found
-            if not content:
-                content = soup.body.get_text() if soup.body else soup.get_text()
-            
-            # Clean up the text
-            content = clean_text(content)
-            
-            # Limit content length
-            if len(content) > 5000:
-                content = content[:5000] + "..."
-            
-            return content
-            
+        entry = article_cache.get(url)
+        headers = entry.validator_headers() if entry is not None else {}
+        client = get_http_client()
+        with track("article_fetch", "GET") as call:
+            async with client.stream(
+                "GET", url, headers=headers, follow_redirects=True, timeout=settings.article_fetch_timeout_seconds
+            ) as response:
+                if response.status_code == 304 and entry is not None:
+                    logger.debug(f"♻️ Article not modified, serving cached text for {url}")
+                    record_cache("article", "revalidated")
+                    return article_cache.mark_revalidated(url)
+                record_cache("article", "miss")
+                response.raise_for_status()
+
+                content_type = response.headers.get("content-type", "").lower()
+                if content_type and not content_type.startswith(HTML_CONTENT_TYPES):
+                    logger.warning(f"⚠️ Skipping {url}: unsupported content type {content_type}")
+                    call.fail("unsupported_content_type")
+                    return None
+
+                body = await _read_capped(response, settings.article_max_bytes, settings.article_max_chars)
+                html = body.decode(response.charset_encoding or "utf-8", errors="replace")
+
+        with track("article_parse", "html"):
+            content = await asyncio.to_thread(_extract_article_text, html, settings.article_max_chars)
+        if content is None:
+            return None
+
+        # Limit content length
+        if len(content) > settings.article_max_chars:
+            content = content[:settings.article_max_chars] + "..."
+
+        article_cache.set(url, content, response.headers.get("etag"), response.headers.get("last-modified"))
+        return content
+
     except httpx.HTTPError as e:
         logger.error(f"HTTP error while fetching URL {url}: {e}")
         return None
@@ -62,6 +101,119 @@ async def extract_text_from_url(url: str) -> Optional[str]:
         logger.error(f"Error extracting text from URL {url}: {e}")
         return None
 
+async def _read_capped(response: httpx.Response, max_bytes: int, max_chars: int) -> bytes:
+    """
+    Read at most max_bytes of the body. Stops early once an <article> has
+    closed and the page so far holds max_chars of visible text, so teaser
+    cards placed before the story don't cut the download short.
+    """
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            logger.info(f"✂️ Article body capped at {max_bytes} bytes")
+            break
+        # Look across the chunk boundary for the closing tag
+        window = (chunks[-2][-16:] if len(chunks) > 1 else b"") + chunk
+        if b"</article>" in window.lower() and _visible_text_length(b"".join(chunks)) >= max_chars:
+            break
+    return b"".join(chunks)[:max_bytes]
+
+def _visible_text_length(html: bytes) -> int:
+    """Rough length of the text a parser would extract (tags, scripts and whitespace runs removed)"""
+    return len(b" ".join(HIDDEN_MARKUP.sub(b" ", html).split()))
+
+def _take_text(strings: Iterable[str], max_chars: int) -> str:
+    """
+    Join text nodes, stopping once enough text has been collected
+    """
+    parts = []
+    size = 0
+    # Leave headroom for clean_text() shrinking whitespace and symbols
+    limit = max_chars * 2
+    for text in strings:
+        parts.append(text)
+        size += len(text)
+        if size >= limit:
+            break
+    return "".join(parts)
+
+def _extract_article_text(html: str, max_chars: int) -> Optional[str]:
+    if SelectolaxParser is not None:
+        content = _extract_with_selectolax(html, max_chars)
+    elif lxml_html is not None:
+        content = _extract_with_lxml(html, max_chars)
+    elif BeautifulSoup is not None:
+        content = _extract_with_bs4(html, max_chars)
+    else:
+        logger.error("❌ No HTML parser installed (selectolax, lxml or beautifulsoup4)")
+        return None
+
+    # Clean up the text
+    return clean_text(content)
+
+def _extract_with_selectolax(html: str, max_chars: int) -> str:
+    tree = SelectolaxParser(html)
+    tree.strip_tags(STRIP_TAGS)
+    def node_text(node) -> str:
+        if node is None:
+            return ""
+        return _take_text(
+            (n.text(deep=False) for n in node.traverse(include_text=True) if n.tag == "-text"),
+            max_chars
+        )
+
+    for selector in CONTENT_SELECTORS:
+        node = tree.css_first(selector)
+        if node is not None:
+            content = node_text(node)
+            if content.strip():
+                return content
+            break
+    # Fallback to body if no specific content found
+    return node_text(tree.body or tree.root)
+
+def _selector_xpath(selector: str) -> str:
+    if selector.startswith("."):
+        return f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {selector[1:]} ')]"
+    return f"//{selector}"
+
+def _extract_with_lxml(html: str, max_chars: int) -> str:
+    if not html.strip():
+        return ""
+    root = lxml_html.fromstring(html)
+    for element in root.xpath("//script|//style|//noscript"):
+        element.drop_tree()
+    for selector in CONTENT_SELECTORS:
+        elements = root.xpath(_selector_xpath(selector))
+        if elements:
+            content = _take_text(elements[0].itertext(), max_chars)
+            if content.strip():
+                return content
+            break
+    # Fallback to body if no specific content found
+    body = root.xpath("//body")
+    return _take_text((body[0] if body else root).itertext(), max_chars)
+
+def _extract_with_bs4(html: str, max_chars: int) -> str:
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Remove script and style elements
+    for script in soup(STRIP_TAGS):
+        script.decompose()
+
+    for selector in CONTENT_SELECTORS:
+        element = soup.select_one(selector)
+        if element is not None:
+            content = _take_text(element.strings, max_chars)
+            if content.strip():
+                return content
+            break
+    # Fallback to body if no specific content found
+    return _take_text((soup.body or soup).strings, max_chars)
+
 def clean_text(text: str) -> str:
     """
     Clean and normalize text content
@@ -193,21 +345,34 @@ def detect_language(text: str) -> str:
     else:
         return 'unknown'
 
-async def batch_process(items: List, batch_size: int = 5):
+async def batch_process(
+    items: List[Any], func: Callable[[Any], Awaitable[Any]], concurrency: int = 5
+) -> AsyncIterator[Tuple[int, Any, Optional[Exception]]]:
     """
-    Process items in batches to avoid overwhelming APIs
+    Run func over items with at most `concurrency` calls in flight.
+    Yields (index, result, error) in completion order; one item failing does
+    not stop the others. Closing the generator cancels any pending calls.
     """
-    results = []
-    for i in range(0, len(items), batch_size):
-        batch = items[i:i + batch_size]
-        # Process batch here
-        results.extend(batch)
-        
-        # Small delay between batches
-        if i + batch_size < len(items):
-            await asyncio.sleep(0.1)
-    
-    return results
+    async def run(index: int, item: Any):
+        try:
+            return index, await func(item), None
+        except Exception as e:
+            return index, None, e
+
+    pending = set()
+    queued = iter(enumerate(items))
+    try:
+        for index, item in itertools.islice(queued, max(1, concurrency)):
+            pending.add(asyncio.create_task(run(index, item)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                for index, item in itertools.islice(queued, 1):
+                    pending.add(asyncio.create_task(run(index, item)))
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
 
 def sanitize_input(text: str) -> str:
     """
@@ -0,0 +1,80 @@
+import json
+from typing import Any, List, Tuple
+
+
+class IncrementalJSONObjectParser:
+    """
+    Parse a JSON object that arrives in chunks and report each top-level
+    field as soon as its value is complete.
+
+    Only string/escape state and nesting depth are tracked while scanning, so
+    each character is looked at once; a member is decoded with json.loads when
+    the comma (or closing brace) after it arrives. Fields that come first in
+    the stream are therefore usable long before the object is finished.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: dict = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add text; returns the (name, value) pairs completed by this chunk
+        """
+        self.buffer += chunk
+        completed: List[Tuple[str, Any]] = []
+        buffer = self.buffer
+        pos = self._pos
+        while pos < len(buffer) and not self.done:
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = pos + 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._close_member(pos, completed)
+                    self.done = True
+            elif char == "," and self._depth == 1:
+                self._close_member(pos, completed)
+                self._member_start = pos + 1
+            pos += 1
+        self._pos = pos
+        return completed
+
+    def _close_member(self, end: int, completed: List[Tuple[str, Any]]):
+        if self._member_start is None:
+            return
+        member = self.buffer[self._member_start:end].strip()
+        if not member:
+            return
+        try:
+            pair = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            return
+        for name, value in pair.items():
+            self.fields[name] = value
+            completed.append((name, value))
+
+    def result(self) -> Any:
+        """The complete decoded object (raises if the JSON is incomplete or invalid)"""
+        start = self.buffer.find("{")
+        if start < 0:
+            raise json.JSONDecodeError("No JSON object", self.buffer, 0)
+        return json.JSONDecoder().raw_decode(self.buffer, start)[0]
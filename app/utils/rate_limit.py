@@ -0,0 +1,55 @@
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Client-side token bucket: `capacity` tokens, refilled continuously over
+    `period_seconds`. Never blocks; callers check and decide what to do.
+    """
+
+    def __init__(self, capacity: float, period_seconds: float):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period_seconds  # tokens per second
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        if now < self._paused_until:
+            self._updated = now
+            return
+        start = max(self._updated, self._paused_until)
+        self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._updated = now
+
+    @property
+    def remaining(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def seconds_until_available(self, tokens: float = 1.0) -> float:
+        self._refill()
+        now = time.monotonic()
+        wait = max(0.0, self._paused_until - now)
+        if self._tokens < tokens:
+            wait += (tokens - self._tokens) / self.rate
+        return wait
+
+    def exhaust(self, reset_at: Optional[float] = None):
+        """
+        Empty the bucket, e.g. after the server reported the limit was hit.
+        `reset_at` is a wall-clock epoch when the server window resets.
+        """
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        if reset_at is not None:
+            self._paused_until = self._updated + max(0.0, reset_at - time.time())
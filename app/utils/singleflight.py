@@ -0,0 +1,80 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (flight id, key) pairs whose shared work the current task is running inside
+_running: contextvars.ContextVar[FrozenSet[Tuple[int, str]]] = contextvars.ContextVar(
+    "singleflight_running", default=frozenset()
+)
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one shared in-flight task.
+
+    The first caller starts the work; later callers with the same key await the
+    same task. A caller that is cancelled does not cancel the shared work for
+    the others; the work is only cancelled once every waiter has gone away.
+    A re-entrant call (the shared work calling do() with its own key) raises
+    RuntimeError instead of waiting on itself forever.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._inflight: Dict[str, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        marker = (id(self), key)
+        if marker in _running.get():
+            raise RuntimeError(f"{self.name}: re-entrant call for {key[:60]} would wait on itself")
+
+        call = self._inflight.get(key)
+        if call is None:
+            self.calls += 1
+            call = _Call(asyncio.ensure_future(self._run(marker, func, *args, **kwargs)))
+            self._inflight[key] = call
+            call.task.add_done_callback(lambda _task, key=key, call=call: self._forget(key, call))
+        else:
+            self.coalesced += 1
+            logger.debug(f"🔗 {self.name}: joined in-flight call for {key[:60]}")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Last interested caller left (cancelled); stop the upstream work
+                call.task.cancel()
+
+    @staticmethod
+    async def _run(marker: Tuple[int, str], func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        # Runs in the shared task's own context copy, so only its callees see the marker
+        _running.set(_running.get() | {marker})
+        return await func(*args, **kwargs)
+
+    def _forget(self, key: str, call: _Call):
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+
+    def is_in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
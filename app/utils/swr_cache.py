@@ -0,0 +1,63 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class StaleWhileRevalidateCache:
+    """
+    Bounded LRU cache whose entries are fresh for `fresh_seconds` and may
+    still be served (as stale) up to `stale_seconds` while a refresh runs.
+    """
+
+    FRESH = "fresh"
+    STALE = "stale"
+
+    def __init__(self, max_entries: int, fresh_seconds: float, stale_seconds: float):
+        self.max_entries = max_entries
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = max(stale_seconds, fresh_seconds)
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """
+        Returns (value, state) where state is FRESH, STALE or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, None
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age > self.stale_seconds:
+            del self._entries[key]
+            self.misses += 1
+            return None, None
+        self._entries.move_to_end(key)
+        if age <= self.fresh_seconds:
+            self.hits += 1
+            return value, self.FRESH
+        self.stale_hits += 1
+        return value, self.STALE
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -44,6 +44,40 @@ async def test_backend():
         result = await multi_agent_orchestrator("Hello, who are you?")
         print(f"   ✅ Orchestrator test: {result[:100]}...")
         
+        # Test 5: Gemini analysis must not block the event loop
+        print("5. Testing non-blocking Gemini analysis...")
+        import time
+        import httpx
+        
+        class SlowResponse:
+            text = '{"is_fake": false, "credibility_level": "credible", "confidence_score": 0.9}'
+        
+        class SlowModel:
+            def generate_content(self, prompt):
+                time.sleep(1.0)  # simulate a slow, blocking SDK call
+                return SlowResponse()
+        
+        gemini.model = SlowModel()
+        gemini.is_available = True
+        settings.gemini_structured_output = False  # exercise the blocking SDK path
+        analysis = asyncio.create_task(gemini.analyze_news_credibility("Test claim", []))
+        await asyncio.sleep(0)
+        
+        served = 0
+        started = time.perf_counter()
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            while not analysis.done():
+                response = await client.get("/health")
+                assert response.status_code == 200
+                served += 1
+                await asyncio.sleep(0.05)
+        analysis_result = await analysis
+        elapsed = time.perf_counter() - started
+        
+        assert served >= 5, f"only {served} requests served during analysis"
+        assert analysis_result.confidence_score == 0.9
+        print(f"   ✅ Served {served} requests during a {elapsed:.1f}s analysis")
+        
         print("\n🎉 All tests passed! Backend is ready for Vercel deployment.")
         return True
         